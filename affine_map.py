@@ -0,0 +1,46 @@
+# affine mapping of a pattern from the boundary triangle onto triangles, without inkex
+# shared by pattern_triangle_matching and core
+
+import hashlib
+import numpy as np
+import three_transform as three
+
+def pathIsTriangle(svg_path):
+    if len(svg_path) == 4 and svg_path[1][0] == 'L' and svg_path[2][0] == 'L' and svg_path[3][0] == 'Z':
+        return True
+    return False
+
+def getTriangleVerts(svg_path):
+    verts = []
+    for i in range (0, 3):
+        verts.append(svg_path[i][1])
+    return verts
+
+def formMatrix(trngle_verts):
+    matrx = []
+    for i in range (0, 2):
+        row = []
+        for j in range(0, 3):
+            row.append(trngle_verts[j][i])
+        matrx.append(row)
+    matrx.append([1, 1, 1])
+    return matrx
+
+def formMatrices(trngles_verts):
+    # formMatrix for N triangles at once, N x 3 x 2 vertices -> N x 3 x 3
+    trngles_verts = np.asarray(trngles_verts, dtype=float)
+    matrices = np.ones((len(trngles_verts), 3, 3))
+    matrices[:, 0:2, :] = trngles_verts.transpose(0, 2, 1)
+    return matrices
+
+def sharedPatternName(pattern_id, trnsform, precision):
+    # triangles whose transforms agree after rounding to precision decimals get the same name
+    key = (pattern_id,) + tuple(round(v, precision) + 0.0 for row in trnsform for v in row)
+    return "pattern_shared_" + hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+
+def computePatternTransforms(trngles_verts, bndry_trngle_matrx, initial_trnsform):
+    # affine maps from the boundary triangle onto each triangle, composed with the initial pattern transform
+    # the boundary is inverted once and all N transforms come out of one batched matmul, N x 2 x 3
+    bndry_to_pattern = three.Matrix3(bndry_trngle_matrx).inverse().compose(initial_trnsform)
+    final_trnsforms = np.matmul(formMatrices(trngles_verts), bndry_to_pattern.m)
+    return final_trnsforms[:, 0:2, :]
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+
+# generate_triangles without inkscape: meshes the outlines of many files in one run, for batch jobs
+# usage: batch_generate.py [options] FILE... or batch_generate.py [options] @LIST, LIST naming one file per line
+# a .svg file gives all its paths (or those named by --id), any other file one outline per line of path data
+
+# standard library
+import os
+import sys
+import argparse
+import multiprocessing
+import xml.etree.ElementTree as etree
+from xml.sax.saxutils import quoteattr
+import numpy as np
+# local library
+import curve_line_intrsctns as curve_utils
+import quad_matching
+import svg_paths
+import bilinear_map
+from mesh import Mesh
+import core
+from triangle_mesh import (threshold, point_colors, point_style, polygon_style, triangle_color, quad_color,
+                           formatCoords, formatCircles, formatPolygons)
+
+svg_ns = 'http://www.w3.org/2000/svg'
+skipped_tags = ['defs', 'pattern', 'symbol', 'clipPath', 'mask', 'marker'] # paths in these are not drawn as such
+identity = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]
+
+def collectPaths(node, parent_mat, res):
+    # (element, path data, transform to document coordinates) of every drawn path under node
+    tag = node.tag.split('}')[-1]
+    if tag in skipped_tags:
+        return
+    mat = svg_paths.composeTransform(parent_mat, svg_paths.parseTransform(node.get('transform')))
+    if tag == 'path' and node.get('d'):
+        res.append((node, node.get('d'), mat))
+    for child in node:
+        collectPaths(child, mat, res)
+
+def transformedPath(d, mat=identity):
+    # path data parsed into document coordinates
+    svg_path = svg_paths.parsePath(d)
+    svg_paths.applyTransformToPath(mat, svg_path)
+    return svg_path
+
+def checkOutline(svg_path):
+    # ValueError unless the path is one closed subpath around some area, the front would not stop otherwise
+    if len(svg_path) == 0:
+        raise ValueError("empty path data")
+    cmds = [cmd for cmd, params in svg_path]
+    if cmds.count('M') > 1 or 'Z' in cmds[:-1]:
+        raise ValueError("more than one subpath, split it with Path->Break Apart")
+    start = svg_path[0][1][0:2]
+    end = [params[-2:] for cmd, params in svg_path if cmd != 'Z'][-1]
+    if cmds[-1] != 'Z' and not np.allclose(start, end):
+        raise ValueError("the path is not closed")
+    pts = np.array([params[k:k+2] for cmd, params in svg_path for k in range(0, len(params), 2)], dtype=float)
+    area = np.sum(pts[:, 0] * np.roll(pts[:, 1], -1) - np.roll(pts[:, 0], -1) * pts[:, 1])
+    size = np.ptp(pts, axis=0)
+    if abs(area) <= 1e-9 * size[0] * size[1] or len(pts) < 3:
+        raise ValueError("the path encloses no area")
+
+def readOutlines(file_name, ids):
+    # (name, parsed path) of the outlines in a file, and the size attributes of its svg root, None for text input
+    # paths that cannot be meshed are reported and left out
+    outlines = []
+    size = None
+    if file_name.lower().endswith('.svg'):
+        root = etree.parse(file_name).getroot()
+        size = {}
+        for name in ['width', 'height', 'viewBox']:
+            if root.get(name) is not None:
+                size[name] = root.get(name)
+        paths = []
+        collectPaths(root, identity, paths)
+        paths = [(node, d, mat) for node, d, mat in paths if not ids or node.get('id') in ids]
+        paths = [(node.get('id') or str(k), d, mat) for k, (node, d, mat) in enumerate(paths)]
+    else:
+        with open(file_name) as f:
+            paths = [(str(k), line, identity) for k, line in enumerate([line for line in f if line.strip()])]
+    for name, d, mat in paths:
+        try:
+            svg_path = transformedPath(d, mat)
+            checkOutline(svg_path)
+        except ValueError as e:
+            sys.stderr.write("%s: skipping %s, %s\n" % (file_name, name, e))
+            continue
+        outlines.append((name, svg_path))
+    return outlines, size
+
+def readMotif(spec):
+    # FILE or FILE#ID -> (styles, commands_list, coords, bbox) of the paths of the motif, in document coordinates
+    file_name, _, motif_id = spec.partition('#')
+    root = etree.parse(file_name).getroot()
+    if motif_id:
+        root = root.find(".//*[@id='%s']" % motif_id)
+        if root is None:
+            raise ValueError("cannot find the motif " + spec)
+    paths = []
+    collectPaths(root, identity, paths)
+    styles = []
+    commands_list = []
+    coords = []
+    curves = []
+    for node, d, mat in paths:
+        svg_path = transformedPath(d, mat)
+        commands, pts = bilinear_map.pathToPoints(svg_path)
+        styles.append(node.get('style', ''))
+        commands_list.append(commands)
+        coords.append(pts)
+        curves.extend(svg_paths.pathCurves(svg_path))
+    if len(curves) == 0:
+        raise ValueError("the motif has no paths: " + spec)
+    mins, maxs = curve_utils.bezier_bbox_many(curves)
+    xmin, ymin = mins.min(axis=0)
+    xmax, ymax = maxs.max(axis=0)
+    q = {'x': xmin, 'y': ymin, 'width': xmax - xmin, 'height': ymax - ymin}
+    return styles, commands_list, np.vstack(coords), q
+
+def layerOpen(name, k):
+    return '<g id="%s%d" inkscape:label="%s" inkscape:groupmode="layer">' % (name, k, name)
+
+def pathElems(paths, merge):
+    if merge:
+        paths = [' '.join(paths)] if len(paths) > 0 else []
+    return ['<path d="%s" />' % path for path in paths]
+
+def meshLayers(task):
+    # formatLayers in a worker process, an outline that fails comes back as its error instead of stopping the run
+    try:
+        return formatLayers(task) + (None,)
+    except Exception as e:
+        return None, None, "%s: %s" % (type(e).__name__, e)
+
+def formatLayers(task):
+    # mesh one outline and format its layers
+    # the motif, when there is one, was handed to the worker once by bilinear_map.initMapping
+    mesh_task, k, show_points, merge, motif_styles = task
+    mesh_arrays, quads = core.meshOutline(mesh_task)
+    mesh = Mesh.fromArrays(mesh_arrays)
+    lines = []
+
+    if show_points:
+        lines.append(layerOpen('points_layer', k))
+        lines.append('<g>')
+        for type in sorted(point_colors):
+            locs = mesh.coords[mesh.types == type]
+            if len(locs) == 0:
+                continue
+            lines.append('<g style="%s">' % (point_style % point_colors[type]))
+            if merge:
+                lines.extend(pathElems(formatCircles(locs, 1.0), True))
+            else:
+                lines.extend(['<circle cx="%s" cy="%s" r="1.0" />' % loc for loc in formatCoords(locs)])
+            lines.append('</g>')
+        lines.append('</g></g>')
+
+    lines.append(layerOpen('triangle_layer', k))
+    lines.append('<g style="%s">' % (polygon_style % triangle_color))
+    lines.extend(pathElems(formatPolygons(mesh.coords[mesh.triangles[~mesh.used]]), merge))
+    lines.append('</g></g>')
+
+    lines.append(layerOpen('quad_layer', k))
+    lines.append('<g style="%s">' % (polygon_style % quad_color))
+    lines.extend(pathElems(formatPolygons(mesh.coords[quads]), merge))
+    lines.append('</g></g>')
+
+    if motif_styles is not None and len(quads) > 0:
+        mats = core.quadTransforms(mesh.coords[quads])
+        lines.append(layerOpen('motif_layer', k))
+        for path_strings in bilinear_map.mapEnvelopes(mats):
+            lines.append('<g>')
+            for style, path in zip(motif_styles, path_strings):
+                lines.append('<path style=%s d="%s" />' % (quoteattr(style), path))
+            lines.append('</g>')
+        lines.append('</g>')
+
+    if len(mesh.coords) > 0:
+        bbox = np.concatenate([mesh.coords.min(axis=0), mesh.coords.max(axis=0)])
+    else:
+        bbox = None
+    return '\n'.join(lines), bbox
+
+def writeSvg(file_name, size, outlines, results):
+    # the user units of an svg input are kept as they are, only text input is fitted to its meshes
+    bboxes = [bbox for layers, bbox in results if bbox is not None]
+    if size is None:
+        size = {}
+        if len(bboxes) > 0:
+            mins = np.min([bbox[0:2] for bbox in bboxes], axis=0)
+            maxs = np.max([bbox[2:4] for bbox in bboxes], axis=0)
+            size['viewBox'] = '%.3f %.3f %.3f %.3f' % (mins[0], mins[1], maxs[0] - mins[0], maxs[1] - mins[1])
+    attrs = ''.join([' %s=%s' % (name, quoteattr(size[name])) for name in sorted(size)])
+    with open(file_name, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<svg xmlns="%s" xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape"%s>\n' % (svg_ns, attrs))
+        for (name, svg_path), (layers, bbox) in zip(outlines, results):
+            f.write('<path id=%s style="fill:none;stroke:#000000" d="%s" />\n'
+                    % (quoteattr(name), svg_paths.formatPath(svg_path)))
+            f.write(layers + '\n')
+        f.write('</svg>\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Triangle and quad meshes of outlines, without inkscape",
+                                     fromfile_prefix_chars='@')
+    parser.add_argument("files", nargs='+', help="svg files, or files with one outline as path data per line")
+    parser.add_argument("--id", action="append", dest="ids", default=[],
+                        help="Id of a path to mesh in the svg files, repeat for several, all paths when not given")
+    parser.add_argument("--size", type=float, default=10, help="Average size of cell")
+    parser.add_argument("--arc-tolerance", type=float, default=0,
+                        help="Max error of curve lengths, 0 to sample curves at a fixed rate")
+    parser.add_argument("--tiles", type=int, default=1, help="Generate the points of an outline in this many tiles")
+    parser.add_argument("--constrained", action="store_true",
+                        help="Triangulate inside the outline only, instead of the convex hull filtered afterwards")
+    parser.add_argument("--matching", choices=quad_matching.modes, default="sweep", help="Quad matching")
+    parser.add_argument("--threshold", type=float, default=threshold, help="Max score of a quad")
+    parser.add_argument("--no-points", action="store_true", help="Leave out the layer showing the generated points")
+    parser.add_argument("--merge-paths", action="store_true", help="Draw each layer as one compound path per style")
+    parser.add_argument("--motif", default="", help="FILE or FILE#ID of an object to map onto every quad")
+    parser.add_argument("--out-dir", default=".", help="Directory of the output files, named after the input files")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes, 0 for one per core")
+    options = parser.parse_args(argv)
+
+    if options.matching == 'optimal' and quad_matching.networkx is None:
+        sys.stderr.write("The optimal quad matching requires networkx, using greedy matching instead.\n")
+        options.matching = 'greedy'
+
+    motif_styles = None
+    init_args = None
+    if options.motif:
+        motif_styles, commands_list, coords, q = readMotif(options.motif)
+        init_args = (commands_list, coords, q)
+
+    # every outline of every file is one task, the pool stays up for the whole run
+    workers = options.workers or multiprocessing.cpu_count()
+    files = []
+    tasks = []
+    for file_name in options.files:
+        try:
+            outlines, size = readOutlines(file_name, options.ids)
+        except (IOError, etree.ParseError) as e:
+            sys.stderr.write("%s: skipping the file, %s\n" % (file_name, e))
+            continue
+        if len(outlines) == 0:
+            sys.stderr.write("No outlines in " + file_name + "\n")
+            continue
+        files.append((file_name, size, outlines))
+        for k, (name, svg_path) in enumerate(outlines):
+            mesh_task = [svg_path, options.size, options.arc_tolerance, options.tiles, options.workers or None,
+                         options.constrained, options.matching, options.threshold]
+            tasks.append((mesh_task, k, not options.no_points, options.merge_paths, motif_styles))
+
+    if workers > 1 and len(tasks) > 1:
+        for mesh_task, k, show_points, merge, styles in tasks:
+            mesh_task[4] = 1 # tiles of an outline run in its worker
+        pool = multiprocessing.Pool(workers, bilinear_map.initMapping if init_args else None, init_args or ())
+        results = pool.imap(meshLayers, tasks)
+    else:
+        pool = None
+        if init_args:
+            bilinear_map.initMapping(*init_args)
+        results = (meshLayers(task) for task in tasks)
+
+    # results arrive in task order, a file is written as soon as its last outline is done
+    try:
+        for file_name, size, outlines in files:
+            file_results = []
+            file_outlines = []
+            for name, svg_path in outlines:
+                layers, bbox, error = next(results)
+                if error is not None:
+                    sys.stderr.write("%s: skipping %s, %s\n" % (file_name, name, error))
+                    continue
+                file_outlines.append((name, svg_path))
+                file_results.append((layers, bbox))
+            if len(file_outlines) == 0:
+                continue
+            base = os.path.splitext(os.path.basename(file_name))[0]
+            out_name = os.path.join(options.out_dir, base + "_mesh.svg")
+            writeSvg(out_name, size, file_outlines, file_results)
+            sys.stdout.write(out_name + "\n")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+if __name__ == '__main__':
+    main()
+
+# vim: expandtab shiftwidth=4 tabstop=8 softtabstop=4 fileencoding=utf-8 textwidth=99
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+
+# times delaunay.triangulate with qhull and with the pure python bowyer-watson fallback
+# usage: python benchmarks/bench_delaunay.py [points ...]
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import delaunay
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    rs = np.random.RandomState(0)
+    for size in sizes:
+        points = rs.rand(size, 2) * 1000
+        for name, use_qhull in [('qhull', True), ('bowyer-watson', False)]:
+            if use_qhull and delaunay.QhullDelaunay is None:
+                print("%8d points  %-14s scipy not installed" % (size, name))
+                continue
+            start = time.time()
+            triangles, neighbors = delaunay.triangulate(points, use_qhull)
+            print("%8d points  %-14s %7.2f s  %d triangles" % (size, name, time.time() - start, len(triangles)))
+
+if __name__ == '__main__':
+    main()
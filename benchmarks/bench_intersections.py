@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+# times the closed form line/bezier intersections against the np.roots and np.linalg versions they replaced,
+# and the batched bezier/ray kernel behind PathIndex.containsExact against calling the scalar one per pair
+# usage: python benchmarks/bench_intersections.py [pairs]
+
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import curve_line_intrsctns as curve_utils
+
+def old_intersect_line_line(pts1, pts2, isRay=False):
+    line_dir = pts1[1] - pts1[0]
+    ray_dir =  pts2[1] - pts2[0]
+    A = np.array([ray_dir, -line_dir]).T
+    if np.linalg.matrix_rank(A) == 2:
+        B = pts1[0] - pts2[0]
+        X = np.linalg.solve(A, B)
+        dist, t = X[0], X[1]
+
+        if t >= 0 and t <= 1 and dist >= 0 and ( (not isRay and dist<=1) or isRay):
+            return [pts2[0]+dist*ray_dir]
+    return []
+
+def old_intersect_bezier_line(ctrl_pts, pts, isRay=False):
+    A = pts[1][1] - pts[0][1]
+    B = pts[0][0] - pts[1][0]
+    C = pts[0][0] * (pts[0][1] - pts[1][1]) + pts[0][1] * (pts[1][0] - pts[0][0])
+
+    coeffs = np.zeros([4, 2])
+    coeffs[0] = -ctrl_pts[0] + 3*ctrl_pts[1] - 3*ctrl_pts[2] + ctrl_pts[3]
+    coeffs[1] = 3 * ctrl_pts[0] - 6*ctrl_pts[1] + 3*ctrl_pts[2]
+    coeffs[2] = -3 * ctrl_pts[0] + 3 * ctrl_pts[1]
+    coeffs[3] = ctrl_pts[0]
+    P = A * coeffs[:,0] + B * coeffs[:,1]
+    P[3] += C
+
+    intrsctns = []
+    for t in np.roots(P):
+        if np.iscomplex(t) or t < 0 or t > 1:
+            continue
+        t = t.real
+        X = curve_utils.bezier_eval(ctrl_pts, t)
+        if ((pts[1][0]-pts[0][0])!=0):
+            s=(X[0]-pts[0][0])/(pts[1][0]-pts[0][0])
+        else:
+            s=(X[1]-pts[0][1])/(pts[1][1]-pts[0][1])
+        if ( s >= 0 and (( not isRay and s <= 1.0 ) or isRay) ):
+            intrsctns.append(X)
+    return intrsctns
+
+def sameHits(old, new):
+    if len(old) != len(new):
+        return False
+    return np.allclose(sorted(map(tuple, old)), sorted(map(tuple, new)), atol=1e-6)
+
+def timePerCall(func, pairs):
+    # best of 5 runs over all pairs, in microseconds per call
+    runs = timeit.repeat(lambda: [func(a, b, True) for a, b in pairs], number=1, repeat=5)
+    return min(runs) / len(pairs) * 1e6
+
+def batchedHits(curves, rays):
+    # the hits of intersect_beziers_lines as lists of points per pair, to compare with the scalar function
+    ts, ss = curve_utils.intersect_beziers_lines(curves, rays, True)
+    return [[curve_utils.bezier_eval(ctrl_pts, t) for t in row[~np.isnan(row)]] for ctrl_pts, row in zip(curves, ts)]
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rs = np.random.RandomState(0)
+    curves = list(rs.rand(num, 4, 2) * 100)
+    lines = list(rs.rand(num, 2, 2) * 100)
+    rays = list(rs.rand(num, 2, 2) * 100)
+
+    for name, old, new, shapes in [('bezier-ray', old_intersect_bezier_line, curve_utils.intersect_bezier_line, curves),
+                                   ('line-ray', old_intersect_line_line, curve_utils.intersect_line_line, lines)]:
+        pairs = list(zip(shapes, rays))
+        mismatches = sum(1 for a, b in pairs if not sameHits(old(a, b, True), new(a, b, True)))
+        old_us = timePerCall(old, pairs)
+        new_us = timePerCall(new, pairs)
+        print("%-10s %8.1f us -> %6.1f us per call, %.1fx, %d of %d pairs differ"
+              % (name, old_us, new_us, old_us / new_us, mismatches, len(pairs)))
+
+    curves = np.array(curves)
+    rays = np.array(rays)
+    mismatches = sum(1 for a, b in zip(batchedHits(curves, rays), [curve_utils.intersect_bezier_line(c, r, True)
+                                                                   for c, r in zip(curves, rays)])
+                     if not sameHits(a, b))
+    scalar_us = timePerCall(curve_utils.intersect_bezier_line, list(zip(curves, rays)))
+    runs = timeit.repeat(lambda: curve_utils.intersect_beziers_lines(curves, rays, True), number=1, repeat=5)
+    batched_us = min(runs) / len(curves) * 1e6
+    print("%-10s %8.1f us -> %6.1f us per pair, %.1fx, %d of %d pairs differ"
+          % ('batched', scalar_us, batched_us, scalar_us / batched_us, mismatches, len(curves)))
+
+if __name__ == '__main__':
+    main()
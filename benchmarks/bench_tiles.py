@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+# times the point generation of one outline as a single front and in tiles, run one after the other and in a pool
+# the serial run also times each tile's front, the time with a core per tile is at least the rest plus the slowest tile
+# usage: python benchmarks/bench_tiles.py [spacing [tiles ...]]
+
+import os
+import sys
+import time
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import svg_paths
+import triangle_mesh
+import core
+
+outline = "M 0.0,0.0 L 100.0,0.0 C 130.0,20.0 130.0,60.0 100.0,80.0 L 60.0,80.0 L 50.0,40.0 L 40.0,80.0 L 0.0,80.0 Z"
+generate_tile = triangle_mesh.generateTile
+tile_times = []
+
+def timedTile(task):
+    start = time.time()
+    res = generate_tile(task)
+    tile_times.append(time.time() - start)
+    return res
+
+def timePoints(spacing, tiles, processes):
+    # best of 3 runs, the tile times of that run, and the number of points
+    best = None
+    for run in range(3):
+        del tile_times[:]
+        start = time.time()
+        coords, types, timestamps = core.outlineToPoints(svg_paths.parsePath(outline), spacing, 0, tiles, processes)
+        run_time = time.time() - start
+        if best is None or run_time < best[0]:
+            best = (run_time, list(tile_times), len(coords))
+    return best
+
+def main():
+    spacing = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    tile_counts = [int(arg) for arg in sys.argv[2:]] or [2, 4]
+    cores = multiprocessing.cpu_count()
+    single, times, points = timePoints(spacing, 1, 1)
+    print("%d cores, spacing %g, %d points" % (cores, spacing, points))
+    print("single front          %7.2f s" % single)
+    triangle_mesh.generateTile = timedTile
+    for tiles in tile_counts:
+        serial, times, points = timePoints(spacing, tiles, 1)
+        projected = serial - sum(times) + max(times)
+        print("%2d tiles, serial      %7.2f s  %.2fx, slowest tile %.2f s, %.2f s outside the tiles, "
+              "%.2f s and %.2fx with %d cores"
+              % (tiles, serial, single / serial, max(times), serial - sum(times), projected, single / projected, tiles))
+        if cores > 1:
+            processes = min(tiles, cores)
+            pooled, times, points = timePoints(spacing, tiles, processes)
+            print("%2d tiles, %2d processes %7.2f s  %.2fx" % (tiles, processes, pooled, single / pooled))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# bilinear mapping of motif points onto quads, without inkex, shared by pattern_bilinear_mapping and the batch driver
+
+import numpy as np
+import svg_paths
+
+# number of points taken by each path command, other commands are dropped
+pts_per_command = {'M': 1, 'L': 1, 'C': 3, 'Q': 2, 'Z': 0}
+
+def pathToPoints(svg_path):
+    # split a parsed path into its command structure and an N x 2 array of all its points
+    commands = []
+    coords = []
+    for cmd, params in svg_path:
+        if cmd in pts_per_command:
+            num = pts_per_command[cmd]
+            commands.append((cmd, num))
+            coords.extend(params[0:2*num])
+    return commands, np.array(coords, dtype=float).reshape(-1, 2)
+
+def pointsToPath(commands, coords):
+    flat = coords.ravel().tolist()
+    res_paths = []
+    k = 0
+    for cmd, num in commands:
+        res_paths.append([cmd, flat[k:k+2*num]])
+        k += 2*num
+    return svg_paths.formatPath(res_paths)
+
+def bilinearMap(pts, q, mat_x, mat_y):
+    # map N x 2 points from the bounding box q onto the quad whose corners are arranged in mat_x, mat_y
+    # with M x 2 x 2 stacks of corners, the points are mapped onto all M quads at once, giving M x N x 2
+    term1 = 1.0 / ( q['width'] * q['height'])
+    mat_x = np.asarray(mat_x, dtype=float)[..., np.newaxis]
+    mat_y = np.asarray(mat_y, dtype=float)[..., np.newaxis]
+    x = pts[:, 0]
+    y = pts[:, 1]
+    u0 = q['x']+q['width'] - x
+    u1 = x - q['x']
+    v0 = y - q['y']
+    v1 = q['y']+q['height'] - y
+    x_map = term1 * (u0 * (mat_x[..., 0, 0, :]*v0 + mat_x[..., 0, 1, :]*v1) + u1 * (mat_x[..., 1, 0, :]*v0 + mat_x[..., 1, 1, :]*v1))
+    y_map = term1 * (u0 * (mat_y[..., 0, 0, :]*v0 + mat_y[..., 0, 1, :]*v1) + u1 * (mat_y[..., 1, 0, :]*v0 + mat_y[..., 1, 1, :]*v1))
+    return np.stack([x_map, y_map], axis=-1)
+
+def quadMatrices(corners):
+    # mat_x, mat_y of bilinearMap for M quads given as M x 4 x 2 corners, in envelope node order
+    corners = np.asarray(corners, dtype=float)
+    order = [[0, 1], [3, 2]]
+    return corners[:, order, 0], corners[:, order, 1]
+
+def formatMotifPaths(commands_list, mapped):
+    res = []
+    start = 0
+    for commands in commands_list:
+        num = sum(count for cmd, count in commands)
+        res.append(pointsToPath(commands, mapped[start:start+num]))
+        start += num
+    return res
+
+# the source object of the worker processes, set once per process by initMapping
+worker_motif = {}
+
+def initMapping(commands_list, coords, q):
+    worker_motif['commands'] = commands_list
+    worker_motif['coords'] = coords
+    worker_motif['q'] = q
+
+def mapEnvelopes(mats):
+    # path data of the source object mapped onto each envelope of a batch, mats is (mats_x, mats_y), M x 2 x 2 each
+    mats_x, mats_y = mats
+    mapped = bilinearMap(worker_motif['coords'], worker_motif['q'], mats_x, mats_y)
+    return [formatMotifPaths(worker_motif['commands'], envelope_mapped) for envelope_mapped in mapped]
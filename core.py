@@ -0,0 +1,104 @@
+# the geometry of the extensions as array-in, array-out functions, without inkex or an svg document
+# outline -> points -> triangles -> quads, and the transforms mapping patterns onto quads and triangles
+# an outline is a path parsed by simplepath or svg_paths.parsePath, or its segments as 2 x 2 lines and 4 x 2 beziers
+
+import numpy as np
+import quad_matching
+import bilinear_map
+import affine_map
+from path_containment import PathIndex
+from mesh import Mesh
+from triangle_mesh import (threshold, flatten_tolerance, outlinePaths, outlinePoints, generateInternalPoints,
+                           generateInternalPointsTiled, outsideTriangles, orientQuads)
+
+identity = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]
+
+def outlineSegments(outline):
+    # a parsed path starts with a command letter (str or unicode), segments with a point
+    if len(outline) > 0 and np.ndim(outline[0][0]) == 0:
+        return outlinePaths(outline)
+    return [np.asarray(path, dtype=float) for path in outline]
+
+def outlineIndex(outline, spacing):
+    # the containment test used by the functions below, built once to pass to several of them
+    return PathIndex(outlineSegments(outline), spacing * flatten_tolerance)
+
+def meshPoints(paths, spacing, arc_tolerance=0, tiles=1, processes=None, path_index=None):
+    # the outline and internal points as a Mesh without triangles yet
+    points = outlinePoints(paths, spacing, arc_tolerance)
+    if tiles > 1:
+        pm = generateInternalPointsTiled(paths, points, spacing, path_index, tiles, processes)
+    else:
+        pm = generateInternalPoints(paths, points, spacing, path_index)
+    return Mesh.fromPoints(pm)
+
+def triangulateMesh(mesh, constrained=False, path_index=None):
+    # constrained, the outline points in order are the boundary and nothing is outside,
+    # otherwise path_index tells which triangles of the convex hull are outside, they are marked used
+    mesh.triangulate(constrained)
+    if not constrained:
+        mesh.used |= outsideTriangles(mesh.coords, mesh.types, mesh.triangles, path_index)
+
+def outlineToPoints(outline, spacing, arc_tolerance=0, tiles=1, processes=None, path_index=None):
+    # vertex, edge and internal points spaced about spacing apart
+    # returns coords N x 2, types N (1 vertex, 2 edge, 3 internal) and timestamps N, the outline points first
+    paths = outlineSegments(outline)
+    if path_index is None:
+        path_index = PathIndex(paths, spacing * flatten_tolerance)
+    mesh = meshPoints(paths, spacing, arc_tolerance, tiles, processes, path_index)
+    return mesh.coords, mesh.types, mesh.timestamps
+
+def pointsToTriangles(coords, types, outline=None, spacing=None, constrained=False, path_index=None):
+    # triangles T x 3 in ccw order, their neighbors T x 3 as in delaunay, and T bool for the triangles outside the outline
+    # constrained, the outline points in order are the boundary and nothing is outside,
+    # otherwise the outline (or path_index) tells which triangles of the convex hull are outside
+    if not constrained and path_index is None:
+        path_index = outlineIndex(outline, spacing)
+    mesh = Mesh(coords, types, np.zeros(len(coords), dtype=np.int32))
+    triangulateMesh(mesh, constrained, path_index)
+    return mesh.triangles, mesh.neighbors, mesh.used
+
+def buildMesh(coords, types, timestamps, triangles, neighbors, outside=None):
+    mesh = Mesh(coords, types, timestamps)
+    mesh.setTriangles(triangles, neighbors)
+    if outside is not None:
+        mesh.used |= outside
+    return mesh
+
+def trianglesToQuads(coords, triangles, neighbors, timestamps=None, outside=None, matching='sweep', threshold=threshold):
+    # pairs of triangles merged into quads, Q x 4 vertex ids, and the ids of the triangles left over
+    # the sweep matching pairs triangles as old as each other first, by the timestamps of their vertices
+    if timestamps is None:
+        timestamps = np.zeros(len(coords), dtype=np.int32)
+    mesh = buildMesh(coords, np.zeros(len(coords), dtype=np.uint8), timestamps, triangles, neighbors, outside)
+    quads = quad_matching.matchQuads(mesh, matching, threshold)
+    return quads, np.nonzero(~mesh.used)[0]
+
+def quadTransforms(corners, orient=True):
+    # mat_x, mat_y of bilinear_map.bilinearMap for Q x 4 x 2 quad corners, in envelope node order
+    # mesh quads are oriented first, so a motif is not mirrored in the quads that wind the other way
+    corners = np.asarray(corners, dtype=float).reshape(-1, 4, 2)
+    if orient:
+        corners = orientQuads(corners)
+    return bilinear_map.quadMatrices(corners)
+
+def mapOntoQuads(pts, bbox, corners, orient=True):
+    # N x 2 pattern points in the bounding box bbox ({'x', 'y', 'width', 'height'}) mapped onto Q quads, Q x N x 2
+    mats_x, mats_y = quadTransforms(corners, orient)
+    return bilinear_map.bilinearMap(np.asarray(pts, dtype=float).reshape(-1, 2), bbox, mats_x, mats_y)
+
+def triangleTransforms(bndry_trngle_verts, trngles_verts, initial_trnsform=identity):
+    # affine maps T x 2 x 3 taking a pattern placed on the boundary triangle (3 x 2) onto T x 3 x 2 triangles,
+    # composed with the pattern's own transform
+    return affine_map.computePatternTransforms(trngles_verts, affine_map.formMatrix(bndry_trngle_verts), initial_trnsform)
+
+def meshOutline(task):
+    # all geometry work for one outline: points, triangles and quads
+    # runs in a worker process when several outlines are selected, so the mesh comes back as plain arrays
+    svg_path, spacing, arc_tolerance, tiles, processes, constrained, matching, threshold = task
+    paths = outlineSegments(svg_path)
+    path_index = PathIndex(paths, spacing * flatten_tolerance)
+    mesh = meshPoints(paths, spacing, arc_tolerance, tiles, processes, path_index)
+    triangulateMesh(mesh, constrained, path_index)
+    quads = quad_matching.matchQuads(mesh, matching, threshold)
+    return mesh.toArrays(), quads
@@ -1,7 +1,12 @@
+import math
 import numpy as np
-import inkex
 
 sample_per_len = 10
+max_subdivisions = 30 # depth limit of adaptive arc length subdivision
+max_newton_steps = 8 # polishing steps of a root, stopped early once the residual no longer drops
+
+# nodes and weights of Gauss-Legendre quadrature on [-1, 1]
+gauss_nodes, gauss_weights = np.polynomial.legendre.leggauss(8)
 
 def bezier_eval(ctrl_pts, t):
     return (1-t)**3 * ctrl_pts[0] + 3*(1-t)**2*t * ctrl_pts[1] + 3 * t**2 * (1-t) * ctrl_pts[2] + t**3 * ctrl_pts[3]
@@ -12,34 +17,92 @@ def get_hull_len(ctrl_pts):
         hull_len += np.linalg.norm(ctrl_pts[i+1]-ctrl_pts[0])
     return hull_len
 
+def bezier_eval_many(ctrl_pts, ts):
+    # evaluate at an array of t at once, returns len(ts) x 2
+    ts = np.asarray(ts, dtype=float)[:, np.newaxis]
+    return bezier_eval(ctrl_pts, ts)
+
+def arc_length_table(ctrl_pts, samples=None):
+    # cumulative chord length of the curve sampled at uniformly spaced t
+    if samples is None:
+        samples = max(int(get_hull_len(ctrl_pts) * sample_per_len), 1)
+    ts = np.linspace(0.0, 1.0, samples + 1)
+    pts = bezier_eval_many(ctrl_pts, ts)
+    chords = np.hypot(*np.diff(pts, axis=0).T)
+    lens = np.concatenate([[0.0], np.cumsum(chords)])
+    return ts, lens
+
+def t_at_lengths(table, lengths, ctrl_pts=None, newton_steps=4):
+    # look up the samples around each arc length, then interpolate linearly between them
+    # when the table holds exact lengths (adaptive table), pass ctrl_pts to refine t with Newton steps
+    ts, lens = table
+    lengths = np.asarray(lengths, dtype=float)
+    i = np.clip(np.searchsorted(lens, lengths), 1, len(lens) - 1)
+    seg_len = lens[i] - lens[i-1]
+    frac = np.where(seg_len > 0, (lengths - lens[i-1]) / np.where(seg_len > 0, seg_len, 1.0), 0.0)
+    t = ts[i-1] + np.clip(frac, 0.0, 1.0) * (ts[i] - ts[i-1])
+    if ctrl_pts is not None:
+        for step in range(newton_steps):
+            residual = lens[i-1] + gauss_length(ctrl_pts, ts[i-1], t) - lengths
+            speed = bezier_speed(ctrl_pts, t)
+            t = t - np.where(speed > 0, residual / np.where(speed > 0, speed, 1.0), 0.0)
+            t = np.clip(t, ts[i-1], ts[i])
+    return t
+
+def bezier_derivative_many(ctrl_pts, ts):
+    ts = np.asarray(ts, dtype=float)[..., np.newaxis]
+    return 3.0 * (1.0-ts)**2 * (ctrl_pts[1] - ctrl_pts[0]) + 6.0 * (1.0-ts) * ts * (ctrl_pts[2] - ctrl_pts[1]) + 3.0 * ts**2 * (ctrl_pts[3] - ctrl_pts[2])
+
+def bezier_speed(ctrl_pts, ts):
+    return np.linalg.norm(bezier_derivative_many(ctrl_pts, ts), axis=-1)
+
+def gauss_length(ctrl_pts, a, b):
+    # arc length between each pair of parameters a[i], b[i]
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    half = 0.5 * (b - a)
+    ts = (0.5 * (a + b))[..., np.newaxis] + half[..., np.newaxis] * gauss_nodes
+    return half * np.dot(bezier_speed(ctrl_pts, ts), gauss_weights)
+
+def adaptive_arc_length_table(ctrl_pts, tolerance):
+    # split [0, 1] until each interval's length agrees with the sum of its halves within its share of tolerance
+    # returns the (t, cumulative length) table at the interval ends and the estimated total error
+    a = np.array([0.0])
+    b = np.array([1.0])
+    whole = gauss_length(ctrl_pts, a, b)
+    done_a, done_b, done_len, done_err = [], [], [], []
+    for depth in range(max_subdivisions + 1):
+        m = 0.5 * (a + b)
+        left = gauss_length(ctrl_pts, a, m)
+        right = gauss_length(ctrl_pts, m, b)
+        err = np.abs(left + right - whole)
+        accept = (err <= tolerance * (b - a)) | (depth == max_subdivisions)
+        done_a.append(a[accept])
+        done_b.append(b[accept])
+        done_len.append((left + right)[accept])
+        done_err.append(err[accept])
+        split = ~accept
+        if not split.any():
+            break
+        a, m, b = a[split], m[split], b[split]
+        a, b = np.concatenate([a, m]), np.concatenate([m, b])
+        whole = np.concatenate([left[split], right[split]])
+
+    starts = np.concatenate(done_a)
+    order = np.argsort(starts)
+    ts = np.append(starts[order], 1.0)
+    lens = np.concatenate([[0.0], np.cumsum(np.concatenate(done_len)[order])])
+    return (ts, lens), np.concatenate(done_err).sum()
+
 def bezier_length(ctrl_pts):
-    # estimate length
-    hull_len = get_hull_len(ctrl_pts)
-    sample_pts = hull_len * sample_per_len
-
-    start = ctrl_pts[0]
-    curve_len = 0
-    for i in range(0, int(sample_pts)):
-        t = i/sample_pts
-        end = bezier_eval(ctrl_pts, t)
-        curve_len += np.linalg.norm(end - start)
-        start = end
-    return curve_len
+    return arc_length_table(ctrl_pts)[1][-1]
 
 def get_t_at_length(ctrl_pts, st, length):
-    hull_len = get_hull_len(ctrl_pts)
-    sample_pts = hull_len * sample_per_len
-
-    acc_len = 0
-    start = bezier_eval(ctrl_pts, st)
-    for i in range(1, int(sample_pts)):
-        t = st + i/sample_pts
-        end = bezier_eval(ctrl_pts, t)
-        acc_len += np.linalg.norm(end - start)
-        start = end
-        if acc_len >= length:
-            return t
-    return -1
+    ts, lens = arc_length_table(ctrl_pts)
+    target = np.interp(st, ts, lens) + length
+    if target > lens[-1]:
+        return -1
+    return float(t_at_lengths((ts, lens), target))
 
 def rotate90cw(vec):
     return np.array([vec[1], -vec[0]])
@@ -62,49 +125,186 @@ def line_normal(pts, ccw):
     else:
         return rotate90cw(tangent)
 
+def polish_root(a, b, c, d, t):
+    # newton steps on a*t^3 + b*t^2 + c*t + d while they make the residual smaller
+    f = ((a*t + b)*t + c)*t + d
+    for step in range(max_newton_steps):
+        df = (3.0*a*t + 2.0*b)*t + c
+        if f == 0 or df == 0:
+            break
+        t_next = t - f / df
+        f_next = ((a*t_next + b)*t_next + c)*t_next + d
+        if abs(f_next) >= abs(f):
+            break
+        t, f = t_next, f_next
+    return t
+
+def deflate(a, b, c, d, r):
+    # quadratic factor of the cubic once the root r is divided out
+    # backward division when r is the largest root, forward otherwise, so the division does not cancel
+    if r != 0 and abs(a * r**3) >= abs(d):
+        f = -d / r
+        e = (f - c) / r
+        return (e - b) / r, e, f
+    e = b + r*a
+    return a, e, c + r*e
+
+def solve_cubic(a, b, c, d):
+    # real roots of a*t^3 + b*t^2 + c*t + d, falls back to quadratic/linear when leading terms vanish
+    # the closed form only gives one root accurately when a is small against the other terms,
+    # so it is polished and divided out, and the other two come from the quadratic left over
+    scale = max(abs(a), abs(b), abs(c), abs(d))
+    if scale == 0:
+        return []
+    eps = 1e-12 * scale
+    if abs(a) <= eps:
+        if abs(b) <= eps:
+            if abs(c) <= eps:
+                return []
+            return [-d / c]
+        disc = c*c - 4.0*b*d
+        if disc < 0:
+            return []
+        q = -0.5 * (c + math.copysign(math.sqrt(disc), c))
+        if q == 0:
+            return [0.0, 0.0]
+        return [polish_root(0.0, b, c, d, q / b), polish_root(0.0, b, c, d, d / q)]
+
+    B, C, D = b / a, c / a, d / a
+    shift = -B / 3.0
+    p = C - B*B / 3.0
+    q = 2.0*B**3 / 27.0 - B*C / 3.0 + D
+    disc = 0.25*q*q + p**3 / 27.0
+    if disc > 0: # one real root
+        sq = math.sqrt(disc)
+        r = cbrt(-0.5*q + sq) + cbrt(-0.5*q - sq) + shift
+    elif p == 0: # triple root
+        return [shift] * 3
+    else: # three real roots, trigonometric form, the largest one
+        rp = math.sqrt(-p / 3.0)
+        phi = math.acos(max(-1.0, min(1.0, -0.5*q / rp**3)))
+        r = max([2.0*rp*math.cos((phi + 2.0*math.pi*k) / 3.0) + shift for k in range(0, 3)], key=abs)
+
+    r = polish_root(a, b, c, d, r)
+    return [r] + [polish_root(a, b, c, d, t) for t in solve_cubic(0.0, *deflate(a, b, c, d, r))]
+
+def solve_cubic_many(a, b, c, d):
+    # solve_cubic for arrays of coefficients, returns roots in an array of shape a.shape + (3,), nan for missing roots
+    a, b, c, d = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (a, b, c, d)])
+    roots = np.full(a.shape + (3,), np.nan)
+    eps = 1e-12 * np.maximum(np.maximum(np.abs(a), np.abs(b)), np.maximum(np.abs(c), np.abs(d)))
+    cubic = np.abs(a) > eps
+
+    with np.errstate(all='ignore'):
+        A = np.where(cubic, a, 1.0)
+        B, C, D = b / A, c / A, d / A
+        shift = -B / 3.0
+        p = C - B*B / 3.0
+        q = 2.0*B**3 / 27.0 - B*C / 3.0 + D
+        disc = 0.25*q*q + p**3 / 27.0
+
+        # one root of each cubic from the closed form, the largest when there are three
+        sq = np.sqrt(np.maximum(disc, 0.0))
+        r = np.cbrt(-0.5*q + sq) + np.cbrt(-0.5*q - sq) + shift
+        rp = np.sqrt(np.maximum(-p / 3.0, 0.0))
+        cos3 = np.where(rp > 0, -0.5*q / np.where(rp > 0, rp, 1.0)**3, 1.0)
+        phi = np.arccos(np.clip(cos3, -1.0, 1.0))
+        trig = np.stack([2.0*rp*np.cos((phi + 2.0*np.pi*k) / 3.0) + shift for k in range(0, 3)], axis=-1)
+        largest = np.take_along_axis(trig, np.argmax(np.abs(trig), axis=-1)[..., np.newaxis], axis=-1)[..., 0]
+        r = np.where(disc > 0, r, largest)
+        r = polish_roots_many(a, b, c, d, np.where(cubic, r, np.nan)[..., np.newaxis])[..., 0]
+
+        # divide it out as in deflate, the quadratic left over is solved below along with the quadratic equations
+        rr = np.where(cubic, r, 0.0)
+        backward = cubic & (rr != 0) & (np.abs(a * rr**3) >= np.abs(d))
+        rb = np.where(backward, rr, 1.0)
+        f_back = -d / rb
+        e_back = (f_back - c) / rb
+        e_fwd = b + rr*a
+        qa = np.where(cubic, np.where(backward, (e_back - b) / rb, a), b)
+        qb = np.where(cubic, np.where(backward, e_back, e_fwd), c)
+        qc = np.where(cubic, np.where(backward, f_back, c + rr*e_fwd), d)
+
+        qeps = 1e-12 * np.maximum(np.maximum(np.abs(qa), np.abs(qb)), np.abs(qc))
+        quad = np.abs(qa) > qeps
+        lin = ~quad & (np.abs(qb) > qeps)
+        disc2 = qb*qb - 4.0*qa*qc
+        two = quad & (disc2 >= 0)
+        qq = -0.5 * (qb + np.copysign(np.sqrt(np.maximum(disc2, 0.0)), qb))
+        roots[..., 1] = np.where(two, np.where(qq != 0, qq / qa, 0.0), np.where(lin, -qc / qb, np.nan))
+        roots[..., 2] = np.where(two, np.where(qq != 0, qc / qq, 0.0), np.nan)
+        roots[..., 1:] = polish_roots_many(a, b, c, d, roots[..., 1:])
+        roots[..., 0] = r
+    return roots
+
+def polish_roots_many(a, b, c, d, roots):
+    # polish_root for arrays, roots of shape a.shape + (k,)
+    a, b, c, d = [x[..., np.newaxis] for x in (a, b, c, d)]
+    with np.errstate(all='ignore'):
+        f = ((a*roots + b)*roots + c)*roots + d
+        for step in range(max_newton_steps):
+            df = (3.0*a*roots + 2.0*b)*roots + c
+            nxt = roots - np.where(df != 0, f / np.where(df != 0, df, 1.0), 0.0)
+            f_next = ((a*nxt + b)*nxt + c)*nxt + d
+            better = np.abs(f_next) < np.abs(f)
+            if not better.any():
+                break
+            roots = np.where(better, nxt, roots)
+            f = np.where(better, f_next, f)
+    return roots
+
+def cbrt(x):
+    return math.copysign(abs(x) ** (1.0/3.0), x)
+
 def intersect_line_ray(pts1, pts2): # line 2 is ray
     return intersect_line_line(pts1, pts2, True)
 
 def intersect_line_line(pts1, pts2, isRay=False):
-    line_dir = pts1[1] - pts1[0]
-    ray_dir =  pts2[1] - pts2[0]
-    A = np.array([ray_dir, -line_dir]).T
-    if np.linalg.matrix_rank(A) == 2:
-        B = pts1[0] - pts2[0]
-        X = np.linalg.solve(A, B)
-        dist, t = X[0], X[1]
-
-        if t >= 0 and t <= 1 and dist >= 0 and ( (not isRay and dist<=1) or isRay):
-            return [pts2[0]+dist*ray_dir]
+    # solve pts2[0] + dist * ray_dir = pts1[0] + t * line_dir with cramer's rule
+    lx, ly = pts1[1][0] - pts1[0][0], pts1[1][1] - pts1[0][1]
+    rx, ry = pts2[1][0] - pts2[0][0], pts2[1][1] - pts2[0][1]
+    det = lx*ry - rx*ly
+    if abs(det) <= 1e-12 * math.hypot(lx, ly) * math.hypot(rx, ry): # parallel or degenerate
+        return []
+    bx, by = pts1[0][0] - pts2[0][0], pts1[0][1] - pts2[0][1]
+    dist = (lx*by - bx*ly) / det
+    t = (rx*by - ry*bx) / det
+
+    if t >= 0 and t <= 1 and dist >= 0 and ( (not isRay and dist<=1) or isRay):
+        return [np.array([pts2[0][0] + dist*rx, pts2[0][1] + dist*ry])]
     return []
 
+def bezier_coeffs(ctrl_pts):
+    # power basis coefficients of the curve, highest degree first
+    coeffs = np.zeros(np.shape(ctrl_pts)[:-2] + (4, 2))
+    coeffs[..., 0, :] = -ctrl_pts[..., 0, :] + 3*ctrl_pts[..., 1, :] - 3*ctrl_pts[..., 2, :] + ctrl_pts[..., 3, :]
+    coeffs[..., 1, :] = 3 * ctrl_pts[..., 0, :] - 6*ctrl_pts[..., 1, :] + 3*ctrl_pts[..., 2, :]
+    coeffs[..., 2, :] = -3 * ctrl_pts[..., 0, :] + 3 * ctrl_pts[..., 1, :]
+    coeffs[..., 3, :] = ctrl_pts[..., 0, :]
+    return coeffs
+
 def intersect_bezier_line(ctrl_pts, pts, isRay=False):
 
     A = pts[1][1] - pts[0][1]
     B = pts[0][0] - pts[1][0]
     C = pts[0][0] * (pts[0][1] - pts[1][1]) + pts[0][1] * (pts[1][0] - pts[0][0])
 
-    P = np.zeros(4)
-    coeffs = np.zeros([4, 2])
-
-    coeffs[0] = -ctrl_pts[0] + 3*ctrl_pts[1] - 3*ctrl_pts[2] + ctrl_pts[3]
-    coeffs[1] = 3 * ctrl_pts[0] - 6*ctrl_pts[1] + 3*ctrl_pts[2]
-    coeffs[2] = -3 * ctrl_pts[0] + 3 * ctrl_pts[1]
-    coeffs[3] = ctrl_pts[0]
-    P = A * coeffs[:,0] + B * coeffs[:,1]
+    # power basis coefficients in plain floats, numpy overhead dominates at this size
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = [(float(pt[0]), float(pt[1])) for pt in ctrl_pts]
+    coeffs = [(-x0 + 3*x1 - 3*x2 + x3, -y0 + 3*y1 - 3*y2 + y3),
+              (3*x0 - 6*x1 + 3*x2, 3*y0 - 6*y1 + 3*y2),
+              (-3*x0 + 3*x1, -3*y0 + 3*y1),
+              (x0, y0)]
+    P = [A * coeff[0] + B * coeff[1] for coeff in coeffs]
     P[3] += C
 
-    r = np.roots(P)
-
     intrsctns = []
 
-    for i in range (0, 3):
-        t = r[i]
-        if np.iscomplex(t) or t < 0 or t > 1:
+    for t in solve_cubic(*P):
+        if t < 0 or t > 1:
             continue
 
-        t = t.real
-        X = bezier_eval(ctrl_pts, t)
+        X = [((coeffs[0][i]*t + coeffs[1][i])*t + coeffs[2][i])*t + coeffs[3][i] for i in range(0, 2)]
 
         if ((pts[1][0]-pts[0][0])!=0):           # if not vertical line
             s=(X[0]-pts[0][0])/(pts[1][0]-pts[0][0])
@@ -113,6 +313,45 @@ def intersect_bezier_line(ctrl_pts, pts, isRay=False):
 
         # in bounds?
         if ( s >= 0 and (( not isRay and s <= 1.0 ) or isRay) ):
-            intrsctns.append(X)
+            intrsctns.append(np.array(X))
 
     return intrsctns
+
+def intersect_beziers_lines(ctrls_pts, lines_pts, isRay=False):
+    # intersect_bezier_line for K curves (K x 4 x 2) and K lines or rays (K x 2 x 2), pair by pair in one pass
+    # returns the parameters t on the curves and s on the lines of the intersections, K x 3 each, nan for missing ones
+    ctrls_pts = np.asarray(ctrls_pts, dtype=float)
+    lines_pts = np.asarray(lines_pts, dtype=float)
+    x0, y0 = lines_pts[:, 0, 0], lines_pts[:, 0, 1]
+    dx, dy = lines_pts[:, 1, 0] - x0, lines_pts[:, 1, 1] - y0
+    coeffs = bezier_coeffs(ctrls_pts)
+    P = dy[:, np.newaxis] * coeffs[..., 0] - dx[:, np.newaxis] * coeffs[..., 1]
+    P[:, 3] += dx*y0 - dy*x0
+
+    ts = solve_cubic_many(P[:, 0], P[:, 1], P[:, 2], P[:, 3])
+    valid = (ts >= 0) & (ts <= 1)
+    t = np.where(valid, ts, 0.0)[..., np.newaxis]
+    k = coeffs[:, np.newaxis]
+    X = ((k[..., 0, :]*t + k[..., 1, :])*t + k[..., 2, :])*t + k[..., 3, :]
+    vertical = (dx == 0)[:, np.newaxis]
+    with np.errstate(all='ignore'):
+        s = np.where(vertical, (X[..., 1] - y0[:, np.newaxis]) / dy[:, np.newaxis],
+                     (X[..., 0] - x0[:, np.newaxis]) / dx[:, np.newaxis])
+    valid &= s >= 0
+    if not isRay:
+        valid &= s <= 1
+    return np.where(valid, ts, np.nan), np.where(valid, s, np.nan)
+
+def bezier_bbox_many(ctrls_pts):
+    # exact bounding boxes of M curves (M x 4 x 2), from the end points and the roots of the derivative
+    # returns M x 2 minimum and M x 2 maximum corners
+    ctrls_pts = np.asarray(ctrls_pts, dtype=float)
+    coeffs = bezier_coeffs(ctrls_pts)
+    # derivative 3*k0*t^2 + 2*k1*t + k2 per axis
+    ts = solve_cubic_many(0.0, 3.0*coeffs[:, 0], 2.0*coeffs[:, 1], coeffs[:, 2])
+    ts = np.where((ts > 0) & (ts < 1), ts, 0.0)
+    k = coeffs[:, np.newaxis, np.newaxis]
+    t = ts[..., np.newaxis]
+    extrema = (((k[..., 0, :]*t + k[..., 1, :])*t + k[..., 2, :])*t + k[..., 3, :]).reshape(len(ctrls_pts), -1, 2)
+    candidates = np.concatenate([ctrls_pts[:, [0, 3]], extrema], axis=1)
+    return candidates.min(axis=1), candidates.max(axis=1)
@@ -0,0 +1,442 @@
+import random
+import numpy as np
+
+# optional, qhull is used when scipy is installed
+try:
+    from scipy.spatial import Delaunay as QhullDelaunay
+except ImportError:
+    QhullDelaunay = None
+
+# triangles are int32 rows of 3 point indices in ccw order
+# neighbors[t][j] is the triangle across edge (triangles[t][j], triangles[t][(j+1)%3]), -1 on the hull
+
+def triangulate(points, use_qhull=True):
+    points = np.asarray(points, dtype=float)
+    if len(points) < 3:
+        return np.zeros((0, 3), dtype=np.int32), np.zeros((0, 3), dtype=np.int32)
+    if use_qhull and QhullDelaunay is not None:
+        return triangulateQhull(points)
+    return triangulateBowyerWatson(points)
+
+def triangulateQhull(points):
+    dt = QhullDelaunay(points)
+    triangles = dt.simplices.astype(np.int32)
+    # qhull lists the neighbor opposite each vertex, shift it to the edge starting at each vertex
+    neighbors = dt.neighbors[:, [2, 0, 1]].astype(np.int32)
+    # make all triangles ccw
+    p = points[triangles]
+    e1 = p[:, 1] - p[:, 0]
+    e2 = p[:, 2] - p[:, 0]
+    cw = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0] < 0
+    triangles[cw] = triangles[cw][:, [0, 2, 1]]
+    neighbors[cw] = neighbors[cw][:, [2, 1, 0]]
+    return triangles, neighbors
+
+def hilbertOrder(points, bits=16):
+    # indices of points sorted along a hilbert curve over their bounding box, for locality of insertion
+    lo = points.min(axis=0)
+    extent = max((points.max(axis=0) - lo).max(), 1e-12)
+    side = (1 << bits) - 1
+    x = ((points[:, 0] - lo[0]) / extent * side).astype(np.int64)
+    y = ((points[:, 1] - lo[1]) / extent * side).astype(np.int64)
+    d = np.zeros(len(points), dtype=np.int64)
+    s = 1 << (bits - 1)
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        # rotate the quadrant
+        flip = ~ry & rx
+        x = np.where(flip, side - x, x)
+        y = np.where(flip, side - y, y)
+        swap = ~ry
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s >>= 1
+    return np.argsort(d, kind='mergesort')
+
+def triangulateBowyerWatson(points):
+    pts_num = len(points)
+    xs = points[:, 0].tolist()
+    ys = points[:, 1].tolist()
+
+    # super triangle enclosing all points, its vertices are appended after the real ones
+    lo = points.min(axis=0)
+    hi = points.max(axis=0)
+    cx, cy = 0.5 * (lo + hi)
+    size = max((hi - lo).max(), 1.0) * 1000.0
+    xs.extend([cx - size, cx + size, cx])
+    ys.extend([cy - size, cy - size, cy + size])
+
+    tri_v = [[pts_num, pts_num + 1, pts_num + 2]]
+    tri_n = [[-1, -1, -1]]
+    alive = [True]
+
+    def orient(a, b, px, py):
+        return (xs[b] - xs[a]) * (py - ys[a]) - (ys[b] - ys[a]) * (px - xs[a])
+
+    def inCircle(t, px, py):
+        a, b, c = tri_v[t]
+        adx, ady = xs[a] - px, ys[a] - py
+        bdx, bdy = xs[b] - px, ys[b] - py
+        cdx, cdy = xs[c] - px, ys[c] - py
+        return ((adx*adx + ady*ady) * (bdx*cdy - cdx*bdy)
+                - (bdx*bdx + bdy*bdy) * (adx*cdy - cdx*ady)
+                + (cdx*cdx + cdy*cdy) * (adx*bdy - bdx*ady)) > 0
+
+    rng = random.Random(0)
+
+    def locate(t, px, py):
+        # walk towards the point, starting each step at a random edge so the walk cannot cycle
+        while True:
+            verts = tri_v[t]
+            start = rng.randint(0, 2)
+            for k in range(3):
+                j = (start + k) % 3
+                if orient(verts[j], verts[(j+1)%3], px, py) < 0:
+                    t = tri_n[t][j]
+                    break
+            else:
+                return t
+
+    last = 0
+    for p in hilbertOrder(points).tolist():
+        px, py = xs[p], ys[p]
+        t = locate(last, px, py)
+        if any(xs[v] == px and ys[v] == py for v in tri_v[t]): # duplicate point, left out
+            continue
+
+        # cavity of triangles whose circumcircle contains the point
+        cavity = set([t])
+        stack = [t]
+        while stack:
+            s = stack.pop()
+            for nb in tri_n[s]:
+                if nb != -1 and nb not in cavity and inCircle(nb, px, py):
+                    cavity.add(nb)
+                    stack.append(nb)
+
+        # boundary of the cavity must be visible from the point, shrink the cavity where rounding broke that
+        while True:
+            boundary = []
+            hidden = None
+            for s in cavity:
+                for j in range(3):
+                    nb = tri_n[s][j]
+                    if nb == -1 or nb not in cavity:
+                        a, b = tri_v[s][j], tri_v[s][(j+1)%3]
+                        if orient(a, b, px, py) <= 0 and s != t:
+                            hidden = s
+                        boundary.append((a, b, nb, s, j))
+            if hidden is None:
+                break
+            cavity.discard(hidden)
+
+        for s in cavity:
+            alive[s] = False
+
+        # fan of new triangles (a, b, p) around the point
+        by_start = {}
+        by_end = {}
+        new_tris = []
+        for a, b, nb, s, j in boundary:
+            nt = len(tri_v)
+            tri_v.append([a, b, p])
+            tri_n.append([nb, -1, -1])
+            alive.append(True)
+            if nb != -1:
+                # point the outer triangle back at the new one
+                nv = tri_v[nb]
+                for k in range(3):
+                    if nv[k] == b and nv[(k+1)%3] == a:
+                        tri_n[nb][k] = nt
+                        break
+            by_start[a] = nt
+            by_end[b] = nt
+            new_tris.append(nt)
+        for nt in new_tris:
+            a, b, _ = tri_v[nt]
+            tri_n[nt][1] = by_start[b]
+            tri_n[nt][2] = by_end[a]
+        last = new_tris[0]
+
+    # drop the triangles of the super triangle
+    for t in range(len(tri_v)):
+        if alive[t] and max(tri_v[t]) >= pts_num:
+            alive[t] = False
+    for t in range(len(tri_v)):
+        if alive[t]:
+            tri_n[t] = [nb if nb != -1 and alive[nb] else -1 for nb in tri_n[t]]
+
+    # the super triangle is finite, so where the hull is nearly straight some hull triangles had a super vertex
+    # and went with it: fill the notches of the boundary until it is convex, then flip the new edges to delaunay
+    def flip(t, j):
+        p, q, r = tri_v[t][j], tri_v[t][(j+1)%3], tri_v[t][(j+2)%3]
+        n_qr, n_rp = tri_n[t][(j+1)%3], tri_n[t][(j+2)%3]
+        u = tri_n[t][j]
+        k = tri_v[u].index(q)
+        s = tri_v[u][(k+2)%3]
+        n_ps, n_sq = tri_n[u][(k+1)%3], tri_n[u][(k+2)%3]
+        tri_v[t] = [r, p, s]
+        tri_n[t] = [n_rp, n_ps, u]
+        tri_v[u] = [s, q, r]
+        tri_n[u] = [n_sq, n_qr, t]
+        if n_ps != -1:
+            tri_n[n_ps][tri_n[n_ps].index(u)] = t
+        if n_qr != -1:
+            tri_n[n_qr][tri_n[n_qr].index(t)] = u
+
+    by_start = {} # boundary edges a -> b as (b, t, j), the inside on their left
+    by_end = {}
+    for t in range(len(tri_v)):
+        if alive[t]:
+            for j in range(3):
+                if tri_n[t][j] == -1:
+                    a, b = tri_v[t][j], tri_v[t][(j+1)%3]
+                    by_start[a] = (b, t, j)
+                    by_end[b] = (a, t, j)
+    notches = list(by_start)
+    added = []
+    while notches:
+        b = notches.pop()
+        if b not in by_start or b not in by_end:
+            continue
+        a, t1, j1 = by_end[b]
+        c, t2, j2 = by_start[b]
+        if a == c or orient(a, b, xs[c], ys[c]) >= 0:
+            continue
+        nt = len(tri_v)
+        tri_v.append([a, c, b])
+        tri_n.append([-1, t2, t1])
+        alive.append(True)
+        tri_n[t1][j1] = nt
+        tri_n[t2][j2] = nt
+        del by_start[b], by_end[b]
+        by_start[a] = (c, nt, 0)
+        by_end[c] = (a, nt, 0)
+        notches.extend([a, c])
+        added.append(nt)
+
+    edges = [(nt, j) for nt in added for j in (1, 2)]
+    while edges:
+        t, j = edges.pop()
+        u = tri_n[t][j]
+        if u == -1:
+            continue
+        q = tri_v[t][(j+1)%3]
+        s = tri_v[u][(tri_v[u].index(q)+2)%3]
+        p, r = tri_v[t][j], tri_v[t][(j+2)%3]
+        convex = orient(r, s, xs[p], ys[p]) * orient(r, s, xs[q], ys[q]) < 0
+        if convex and inCircle(t, xs[s], ys[s]):
+            flip(t, j)
+            # the four outer edges of the flipped pair
+            edges.extend([(t, 0), (t, 1), (u, 0), (u, 1)])
+
+    # compact
+    keep = [i for i in range(len(tri_v)) if alive[i]]
+    new_index = np.full(len(tri_v) + 1, -1, dtype=np.int32)
+    new_index[keep] = np.arange(len(keep), dtype=np.int32)
+    triangles = np.array([tri_v[i] for i in keep], dtype=np.int32).reshape(-1, 3)
+    neighbors = new_index[np.array([tri_n[i] for i in keep], dtype=np.int64).reshape(-1, 3)]
+    return triangles, neighbors
+
+def triangulateConstrained(points, loop, use_qhull=True):
+    # delaunay triangulation of the inside of the closed polygon through points[loop]
+    # the polygon edges are forced into the mesh and the triangles outside them are dropped,
+    # neighbors are -1 across the polygon edges
+    points = np.asarray(points, dtype=float)
+    triangles, neighbors = triangulate(points, use_qhull)
+    if len(triangles) == 0:
+        return triangles, neighbors
+    xs = points[:, 0].tolist()
+    ys = points[:, 1].tolist()
+    tri_v = triangles.tolist()
+    tri_n = neighbors.tolist()
+
+    vert_tri = [-1] * len(points) # one triangle around each vertex
+    for t in range(len(tri_v)):
+        for v in tri_v[t]:
+            vert_tri[v] = t
+
+    # vertices left out of the triangulation (duplicates) are replaced by the closest vertex in it
+    used = np.array([t != -1 for t in vert_tri])
+    used_ids = np.nonzero(used)[0]
+    canon = list(range(len(points)))
+    for v in np.nonzero(~used)[0].tolist():
+        canon[v] = int(used_ids[np.argmin(np.sum((points[used_ids] - points[v])**2, axis=1))])
+
+    def orient(a, b, c):
+        return (xs[b] - xs[a]) * (ys[c] - ys[a]) - (ys[b] - ys[a]) * (xs[c] - xs[a])
+
+    def inCircle(t, v):
+        a, b, c = tri_v[t]
+        adx, ady = xs[a] - xs[v], ys[a] - ys[v]
+        bdx, bdy = xs[b] - xs[v], ys[b] - ys[v]
+        cdx, cdy = xs[c] - xs[v], ys[c] - ys[v]
+        return ((adx*adx + ady*ady) * (bdx*cdy - cdx*bdy)
+                - (bdx*bdx + bdy*bdy) * (adx*cdy - cdx*ady)
+                + (cdx*cdx + cdy*cdy) * (adx*bdy - bdx*ady)) > 0
+
+    def edgeKey(a, b):
+        if a < b:
+            return (a, b)
+        return (b, a)
+
+    def around(a):
+        # triangles around vertex a with the index of a in each, walking both ways from vert_tri[a]
+        start = vert_tri[a]
+        res = []
+        t = start
+        while True:
+            i = tri_v[t].index(a)
+            res.append((t, i))
+            t = tri_n[t][(i+2)%3]
+            if t == -1 or t == start:
+                break
+        if t == -1:
+            t = tri_n[start][tri_v[start].index(a)]
+            while t != -1:
+                i = tri_v[t].index(a)
+                res.append((t, i))
+                t = tri_n[t][i]
+        return res
+
+    def findEdge(a, b):
+        # (triangle, j) holding the directed edge a -> b, None if there is none
+        for t, i in around(a):
+            if tri_v[t][(i+1)%3] == b:
+                return t, i
+        return None
+
+    def flip(t, j):
+        # replace the diagonal tri_v[t][j] -> tri_v[t][j+1] of the quad formed with the neighbor, returns the new diagonal
+        p, q, r = tri_v[t][j], tri_v[t][(j+1)%3], tri_v[t][(j+2)%3]
+        n_qr, n_rp = tri_n[t][(j+1)%3], tri_n[t][(j+2)%3]
+        u = tri_n[t][j]
+        k = tri_v[u].index(q)
+        s = tri_v[u][(k+2)%3]
+        n_ps, n_sq = tri_n[u][(k+1)%3], tri_n[u][(k+2)%3]
+        tri_v[t] = [r, p, s]
+        tri_n[t] = [n_rp, n_ps, u]
+        tri_v[u] = [s, q, r]
+        tri_n[u] = [n_sq, n_qr, t]
+        if n_ps != -1:
+            tri_n[n_ps][tri_n[n_ps].index(u)] = t
+        if n_qr != -1:
+            tri_n[n_qr][tri_n[n_qr].index(t)] = u
+        vert_tri[p] = t
+        vert_tri[q] = u
+        vert_tri[r] = t
+        vert_tri[s] = t
+        return r, s
+
+    def isConvex(t, j):
+        p, q, r = tri_v[t][j], tri_v[t][(j+1)%3], tri_v[t][(j+2)%3]
+        u = tri_n[t][j]
+        s = tri_v[u][(tri_v[u].index(q)+2)%3]
+        return orient(r, s, p) * orient(r, s, q) < 0
+
+    def crossedEdges(a, b):
+        # edges crossed by the segment a -> b, or a vertex lying on it
+        for t, i in around(a):
+            v1, v2 = tri_v[t][(i+1)%3], tri_v[t][(i+2)%3]
+            o1, o2 = orient(a, b, v1), orient(a, b, v2)
+            for v, o in ((v1, o1), (v2, o2)):
+                if o == 0 and (xs[v] - xs[a]) * (xs[b] - xs[a]) + (ys[v] - ys[a]) * (ys[b] - ys[a]) > 0:
+                    return [], v
+            if o1 < 0 and o2 > 0:
+                break
+        else:
+            return [], None
+        crossed = [(v1, v2)]
+        j = (i+1)%3
+        while True:
+            u = tri_n[t][j]
+            k = tri_v[u].index(tri_v[t][(j+1)%3])
+            w = tri_v[u][(k+2)%3]
+            if w == b:
+                return crossed, None
+            side = orient(a, b, w)
+            if side == 0:
+                return [], w
+            t = u
+            if (side > 0) == (orient(a, b, tri_v[u][k]) > 0):
+                j = (k+1)%3
+            else:
+                j = (k+2)%3
+            crossed.append((tri_v[t][j], tri_v[t][(j+1)%3]))
+
+    constraints = set()
+    segments = []
+    for i in range(len(loop)):
+        a, b = canon[loop[i]], canon[loop[(i+1)%len(loop)]]
+        if a != b:
+            segments.append((a, b))
+
+    while segments:
+        a, b = segments.pop()
+        if findEdge(a, b) is not None or findEdge(b, a) is not None:
+            constraints.add(edgeKey(a, b))
+            continue
+        crossed, on_segment = crossedEdges(a, b)
+        if on_segment is not None:
+            # a vertex lies on the segment, constrain both halves
+            segments.append((a, on_segment))
+            segments.append((on_segment, b))
+            continue
+        if len(crossed) == 0: # cannot be enforced
+            continue
+
+        # flip the crossed edges away, those in a concave quad are retried later
+        new_edges = []
+        while crossed:
+            p, q = crossed.pop(0)
+            t, j = findEdge(p, q)
+            if not isConvex(t, j):
+                crossed.append((p, q))
+                continue
+            r, s = flip(t, j)
+            if orient(a, b, r) * orient(a, b, s) < 0:
+                crossed.append((r, s))
+            else:
+                new_edges.append((r, s))
+        constraints.add(edgeKey(a, b))
+
+        # restore the delaunay property on the new edges
+        swapped = True
+        while swapped:
+            swapped = False
+            for n in range(len(new_edges)):
+                r, s = new_edges[n]
+                if edgeKey(r, s) in constraints:
+                    continue
+                t, j = findEdge(r, s)
+                u = tri_n[t][j]
+                if u == -1:
+                    continue
+                w = tri_v[u][(tri_v[u].index(s)+2)%3]
+                if inCircle(t, w) and isConvex(t, j):
+                    new_edges[n] = flip(t, j)
+                    swapped = True
+
+    # flood the outside from the hull edges that are not constrained
+    outside = [False] * len(tri_v)
+    stack = []
+    for t in range(len(tri_v)):
+        for j in range(3):
+            if tri_n[t][j] == -1 and edgeKey(tri_v[t][j], tri_v[t][(j+1)%3]) not in constraints and not outside[t]:
+                outside[t] = True
+                stack.append(t)
+    while stack:
+        t = stack.pop()
+        for j in range(3):
+            u = tri_n[t][j]
+            if u != -1 and not outside[u] and edgeKey(tri_v[t][j], tri_v[t][(j+1)%3]) not in constraints:
+                outside[u] = True
+                stack.append(u)
+
+    keep = [t for t in range(len(tri_v)) if not outside[t]]
+    new_index = np.full(len(tri_v) + 1, -1, dtype=np.int32)
+    new_index[keep] = np.arange(len(keep), dtype=np.int32)
+    triangles = np.array([tri_v[t] for t in keep], dtype=np.int32).reshape(-1, 3)
+    neighbors = new_index[np.array([tri_n[t] for t in keep], dtype=np.int64).reshape(-1, 3)]
+    return triangles, neighbors
@@ -0,0 +1,85 @@
+import numpy as np
+import delaunay
+
+class Mesh(object):
+    # points, triangles and edges held as flat arrays
+    # points: coords N x 2 float64, types N uint8 (1 vertex, 2 edge, 3 internal point), timestamps N int32
+    # triangles: T x 3 int32 in ccw order, neighbors T x 3 int32 as in delaunay, used T bool
+    # edges: E x 2 int32 sorted by (lower, higher) vertex, edge_triangles E x 2 int32 with -1 on the hull,
+    # edge_order lists the edges in the order they first appear in the triangles
+    __slots__ = ('coords', 'types', 'timestamps', 'triangles', 'neighbors', 'triangle_timestamps', 'used',
+                 'edges', 'edge_triangles', 'edge_order')
+
+    def __init__(self, coords, types, timestamps):
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.types = np.asarray(types, dtype=np.uint8)
+        self.timestamps = np.asarray(timestamps, dtype=np.int32)
+        self.setTriangles(np.zeros((0, 3), dtype=np.int32), np.zeros((0, 3), dtype=np.int32))
+
+    @classmethod
+    def fromPoints(cls, pts):
+        # from a list of triangle_mesh.Point
+        coords = np.array([point.loc for point in pts], dtype=np.float64).reshape(-1, 2)
+        return cls(coords, [point.type for point in pts], [point.timestamp for point in pts])
+
+    def toArrays(self):
+        # all arrays in __slots__ order, to cross a process boundary as plain buffers
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    @classmethod
+    def fromArrays(cls, arrays):
+        mesh = cls.__new__(cls)
+        for name, array in zip(cls.__slots__, arrays):
+            setattr(mesh, name, array)
+        return mesh
+
+    def boundaryLoop(self):
+        # the outline runs through the vertex and edge points in order
+        return np.nonzero(self.types != 3)[0]
+
+    def triangulate(self, constrained=False):
+        if constrained:
+            triangles, neighbors = delaunay.triangulateConstrained(self.coords, self.boundaryLoop().tolist())
+        else:
+            triangles, neighbors = delaunay.triangulate(self.coords)
+        self.setTriangles(triangles, neighbors)
+
+    def setTriangles(self, triangles, neighbors):
+        self.triangles = np.asarray(triangles, dtype=np.int32).reshape(-1, 3)
+        self.neighbors = np.asarray(neighbors, dtype=np.int32).reshape(-1, 3)
+        self.used = np.zeros(len(self.triangles), dtype=bool)
+        if len(self.triangles) > 0:
+            # a triangle is as old as its oldest vertex
+            self.triangle_timestamps = self.timestamps[self.triangles].min(axis=1)
+        else:
+            self.triangle_timestamps = np.zeros(0, dtype=np.int32)
+        self.buildEdges()
+
+    def buildEdges(self):
+        # every triangle side, keyed by its vertices, sorted so equal sides are next to each other
+        starts = self.triangles.ravel()
+        ends = np.roll(self.triangles, -1, axis=1).ravel()
+        low = np.minimum(starts, ends).astype(np.int64)
+        high = np.maximum(starts, ends).astype(np.int64)
+        keys = low * len(self.coords) + high
+        order = np.argsort(keys, kind='mergesort')
+        sorted_keys = keys[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        first_ids = np.nonzero(first)[0]
+        counts = np.diff(np.append(first_ids, len(order)))
+
+        self.edges = np.stack([low[order[first_ids]], high[order[first_ids]]], axis=1).astype(np.int32)
+        edge_triangles = np.full((len(first_ids), 2), -1, dtype=np.int32)
+        edge_triangles[:, 0] = order[first_ids] // 3
+        shared = counts == 2
+        edge_triangles[shared, 1] = order[first_ids[shared] + 1] // 3
+        self.edge_triangles = edge_triangles
+        self.edge_order = np.argsort(order[first_ids], kind='mergesort').astype(np.int32)
+
+    def thirdVerts(self, triangle_ids, edge_ids):
+        # the vertex of each triangle not on the given edge
+        tri = self.triangles[triangle_ids]
+        edges = self.edges[edge_ids]
+        off_edge = (tri != edges[:, 0:1]) & (tri != edges[:, 1:2])
+        return tri[np.arange(len(tri)), np.argmax(off_edge, axis=1)]
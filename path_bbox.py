@@ -0,0 +1,77 @@
+import os
+# local library
+import inkex
+import cubicsuperpath
+import simpletransform
+import curve_line_intrsctns as curve_utils
+
+try:
+    from subprocess import Popen, PIPE
+    bsubprocess = True
+except:
+    bsubprocess = False
+
+identity = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]
+
+def pathBBox(path_string, mat):
+    # exact bounding box of a path's curves after transform mat, None for an empty path
+    csp = cubicsuperpath.parsePath(path_string)
+    simpletransform.applyTransformToPath(mat, csp)
+    curves = []
+    for subpath in csp:
+        for i in range(1, len(subpath)):
+            curves.append([subpath[i-1][1], subpath[i-1][2], subpath[i][0], subpath[i][1]])
+        if len(subpath) == 1:
+            curves.append([subpath[0][1]] * 4)
+    if len(curves) == 0:
+        return None
+    mins, maxs = curve_utils.bezier_bbox_many(curves)
+    xmin, ymin = mins.min(axis=0)
+    xmax, ymax = maxs.max(axis=0)
+    return xmin, xmax, ymin, ymax
+
+def computeBBox(nodes, mat=identity):
+    # same contract as simpletransform.computeBBox, but paths use the curve extrema instead of control points
+    bbox = None
+    for node in nodes:
+        m = simpletransform.composeTransform(mat, simpletransform.parseTransform(node.get('transform')))
+        if node.tag == inkex.addNS('path', 'svg') and node.get('d'):
+            bbox = simpletransform.boxunion(pathBBox(node.get('d'), m), bbox)
+        elif node.tag == inkex.addNS('g', 'svg'):
+            bbox = simpletransform.boxunion(computeBBox(node, m), bbox)
+        else:
+            bbox = simpletransform.boxunion(simpletransform.computeBBox([node], mat), bbox)
+    return bbox
+
+def parentsTransform(node):
+    # transform from the coordinates of node's parent to document coordinates
+    mat = identity
+    parent = node.getparent()
+    while parent is not None:
+        mat = simpletransform.composeTransform(simpletransform.parseTransform(parent.get('transform')), mat)
+        parent = parent.getparent()
+    return mat
+
+def getBBox(node):
+    # bounding box of node in document coordinates, in the format of inkscape --query
+    bbox = computeBBox([node], parentsTransform(node))
+    if bbox is None:
+        return {'x':0,'y':0,'width':0,'height':0}
+    xmin, xmax, ymin, ymax = bbox
+    return {'x':xmin, 'y':ymin, 'width':xmax-xmin, 'height':ymax-ymin}
+
+def queryBBox(file, id, scale):
+    # ask a separate inkscape instance for the visual bounding box, one process per query
+    q = {'x':0,'y':0,'width':0,'height':0}
+    for query in q.keys():
+        if bsubprocess:
+            p = Popen('inkscape --query-%s --query-id=%s "%s"' % (query,id,file), shell=True, stdout=PIPE, stderr=PIPE)
+            rc = p.wait()
+            q[query] = scale*float(p.stdout.read())
+            err = p.stderr.read()
+        else:
+            f,err = os.popen3('inkscape --query-%s --query-id=%s "%s"' % (query,id,file))[1:]
+            q[query] = scale*float(f.read())
+            f.close()
+            err.close()
+    return q
@@ -0,0 +1,157 @@
+import math
+import numpy as np
+import curve_line_intrsctns as curve_utils
+
+def flattenBezier(ctrl_pts, tolerance):
+    # number of chords so that the polyline stays within tolerance of the curve,
+    # from the bound on the second derivative of the cubic
+    dd = max(np.linalg.norm(ctrl_pts[0] - 2*ctrl_pts[1] + ctrl_pts[2]),
+             np.linalg.norm(ctrl_pts[1] - 2*ctrl_pts[2] + ctrl_pts[3]))
+    segs_num = max(1, int(math.ceil(math.sqrt(0.75 * dd / tolerance))))
+    ts = np.linspace(0.0, 1.0, segs_num + 1)[:, np.newaxis]
+    return curve_utils.bezier_eval(ctrl_pts, ts)
+
+def flattenPaths(paths, tolerance):
+    # boundary as an array of edges [x0, y0, x1, y1]
+    edges = []
+    for path in paths:
+        if len(path) == 2:
+            polyline = np.array(path, dtype=float)
+        else:
+            polyline = flattenBezier(np.array(path, dtype=float), tolerance)
+        edges.append(np.hstack([polyline[:-1], polyline[1:]]))
+    return np.vstack(edges)
+
+def pathsToCurves(paths):
+    # the segments as an M x 4 x 2 array of cubics, lines with their control points on the line
+    curves = []
+    for path in paths:
+        path = np.array(path, dtype=float)
+        if len(path) == 2:
+            path = np.array([path[0], (2*path[0] + path[1]) / 3.0, (path[0] + 2*path[1]) / 3.0, path[1]])
+        curves.append(path)
+    return np.array(curves, dtype=float).reshape(-1, 4, 2)
+
+class PathIndex:
+    # point in path test against a flattened copy of the boundary
+    # edges are bucketed into horizontal bands, a query only casts its ray against the edges of its band
+
+    end_tolerance = 1e-9 # roots this close to the end of a curve are left to its end points
+
+    def __init__(self, paths, tolerance):
+        # the curves themselves for containsExact
+        self.curves = pathsToCurves(paths)
+        self.curve_ymin = self.curves[:, :, 1].min(axis=1)
+        self.curve_ymax = self.curves[:, :, 1].max(axis=1)
+        self.xmin = self.curves[:, :, 0].min() if len(self.curves) > 0 else 0.0
+
+        edges = flattenPaths(paths, tolerance)
+        # horizontal edges never cross a horizontal ray
+        edges = edges[edges[:, 1] != edges[:, 3]]
+        self.x0, self.y0, self.x1, self.y1 = [np.ascontiguousarray(edges[:, i]) for i in range(4)]
+        self.dxdy = (self.x1 - self.x0) / (self.y1 - self.y0)
+
+        edge_ymin = np.minimum(self.y0, self.y1)
+        edge_ymax = np.maximum(self.y0, self.y1)
+        if len(edges) == 0: # degenerate boundary, nothing is inside
+            self.ymin = self.ymax = 0.0
+        else:
+            self.ymin = edge_ymin.min()
+            self.ymax = edge_ymax.max()
+        self.bands_num = max(1, len(edges))
+        if self.ymax > self.ymin:
+            self.band_height = (self.ymax - self.ymin) / self.bands_num
+        else:
+            self.band_height = 1.0
+
+        # band range covered by each edge, then store band -> edges in compressed rows
+        first_band = self.getBand(edge_ymin)
+        last_band = self.getBand(edge_ymax)
+        span = last_band - first_band + 1
+        edge_ids = np.repeat(np.arange(len(edges)), span)
+        band_ids = np.repeat(first_band, span) + np.arange(span.sum()) - np.repeat(np.cumsum(span) - span, span)
+        order = np.argsort(band_ids, kind='mergesort')
+        self.band_edges = edge_ids[order]
+        self.band_start = np.searchsorted(band_ids[order], np.arange(self.bands_num + 1))
+
+    def getBand(self, y):
+        band = np.floor((y - self.ymin) / self.band_height).astype(int)
+        return np.clip(band, 0, self.bands_num - 1)
+
+    def contains(self, pt_loc):
+        x, y = pt_loc[0], pt_loc[1]
+        if not (self.ymin <= y < self.ymax):
+            return False
+        band = int(self.getBand(y))
+        ids = self.band_edges[self.band_start[band]:self.band_start[band+1]]
+        y0 = self.y0[ids]
+        y1 = self.y1[ids]
+        crossing = (y0 > y) != (y1 > y)
+        x_int = self.x0[ids] + (y - y0) * self.dxdy[ids]
+        return np.count_nonzero(crossing & (x_int > x)) % 2 == 1
+
+    def containsMany(self, pts):
+        # N x 2 array of points -> boolean array
+        pts = np.asarray(pts, dtype=float).reshape(-1, 2)
+        x, y = pts[:, 0], pts[:, 1]
+        inside = np.zeros(len(pts), dtype=bool)
+        in_range = np.nonzero((y >= self.ymin) & (y < self.ymax))[0]
+        if len(in_range) == 0:
+            return inside
+
+        # one (point, edge) pair per edge in the band of each point
+        band = self.getBand(y[in_range])
+        counts = self.band_start[band+1] - self.band_start[band]
+        pair_pt = np.repeat(in_range, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_edge = self.band_edges[np.repeat(self.band_start[band], counts) + offsets]
+
+        py = y[pair_pt]
+        y0 = self.y0[pair_edge]
+        y1 = self.y1[pair_edge]
+        crossing = (y0 > py) != (y1 > py)
+        x_int = self.x0[pair_edge] + (py - y0) * self.dxdy[pair_edge]
+        hits = crossing & (x_int > x[pair_pt])
+        inside[:] = np.bincount(pair_pt[hits], minlength=len(pts)) % 2 == 1
+        return inside
+
+    def containsExact(self, pts):
+        # containsMany against the curves instead of their flattened copy, for points that can lie within tolerance
+        # of the boundary; each point is paired with the curves spanning its height, in one batched intersection
+        pts = np.asarray(pts, dtype=float).reshape(-1, 2)
+        inside = np.zeros(len(pts), dtype=bool)
+        if len(pts) == 0 or len(self.curves) == 0:
+            return inside
+
+        # points sorted by height, so the points each curve spans are one slice
+        order = np.argsort(pts[:, 1], kind='mergesort')
+        ys = pts[order, 1]
+        first = np.searchsorted(ys, self.curve_ymin, 'left')
+        counts = np.searchsorted(ys, self.curve_ymax, 'right') - first
+        pair_curve = np.repeat(np.arange(len(self.curves)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_pt = order[np.repeat(first, counts) + offsets]
+        if len(pair_pt) == 0:
+            return inside
+
+        # rays start left of the whole boundary and pass through their point at s = 1,
+        # so the crossings right of the point are those with s > 1
+        px, py = pts[pair_pt, 0], pts[pair_pt, 1]
+        rays = np.empty((len(pair_pt), 2, 2))
+        rays[:, 0, 0] = self.xmin - 1.0
+        rays[:, 0, 1] = py
+        rays[:, 1, 0] = px
+        rays[:, 1, 1] = py
+        ts, ss = curve_utils.intersect_beziers_lines(self.curves[pair_curve], rays, True)
+        interior = (ts > self.end_tolerance) & (ts < 1.0 - self.end_tolerance)
+        crossings = np.count_nonzero(interior & (ss > 1), axis=1)
+
+        # a curve crosses the ray's line an odd number of times when its ends are on either side, as in contains;
+        # when the interior roots do not add up to that, the missing crossing is at the end nearest the line
+        curves = self.curves[pair_curve]
+        ends_apart = (curves[:, 0, 1] > py) != (curves[:, 3, 1] > py)
+        at_end = (np.count_nonzero(interior, axis=1) % 2 == 1) != ends_apart
+        end_x = np.where(np.abs(curves[:, 0, 1] - py) <= np.abs(curves[:, 3, 1] - py), curves[:, 0, 0], curves[:, 3, 0])
+        crossings += at_end & (end_x > px)
+        inside[:] = np.bincount(pair_pt, crossings, minlength=len(pts)).astype(int) % 2 == 1
+        return inside
@@ -1,12 +1,5 @@
-import sys
-import os
-import re
 import copy
-try:
-    from subprocess import Popen, PIPE
-    bsubprocess = True
-except:
-    bsubprocess = False
+import multiprocessing
 # local library
 import inkex
 import simplepath
@@ -23,6 +16,69 @@ except:
     inkex.errormsg(_("Failed to import the numpy or numpy.linalg modules. These modules are required by this extension. Please install them and try again.  On a Debian-like system this can be done with the command, sudo apt-get install python-numpy."))
     exit()
 
+import three_transform as three
+import path_bbox
+import core
+from bilinear_map import pathToPoints, pointsToPath, bilinearMap, formatMotifPaths, initMapping, mapEnvelopes
+
+# below this many mapped points (envelopes times motif points) the envelopes are mapped in this process,
+# mapping takes a few microseconds per point and starting a pool costs more than that for small selections
+min_parallel_points = 200000
+
+class MotifTemplate:
+    # the source object parsed once: its element structure, the command structure of each path,
+    # and the points of all paths in one array, in the coordinates of a copy appended to the root
+
+    def __init__(self, obj):
+        self.commands = []
+        coords = []
+        self.skeleton = self.build(obj, [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], coords)
+        if len(coords) > 0:
+            self.coords = numpy.vstack(coords)
+        else:
+            self.coords = numpy.zeros((0, 2))
+
+    def build(self, node, parent_mat, coords):
+        # (tag, attributes, text, tail, children) for paths and groups, the node itself for anything else
+        if node.tag == inkex.addNS('path','svg'):
+            mat = simpletransform.composeTransform(parent_mat, simpletransform.parseTransform(node.get('transform')))
+            commands, pts = pathToPoints(simplepath.parsePath(node.get('d')))
+            self.commands.append(commands)
+            coords.append(three.Matrix3(mat).inverse().applyToPoints(pts))
+            return (node.tag, dict(node.attrib), node.text, node.tail, [])
+        elif node.tag == inkex.addNS('g','svg'):
+            mat = simpletransform.composeTransform(parent_mat, simpletransform.parseTransform(node.get('transform')))
+            children = [self.build(child, mat, coords) for child in node]
+            return (node.tag, dict(node.attrib), node.text, node.tail, children)
+        return node
+
+    def formatPaths(self, mapped):
+        # path data of every path of the source object, taking their points from mapped
+        return formatMotifPaths(self.commands, mapped)
+
+    def stamp(self, parent, mapped):
+        # create a copy of the source object under parent, its paths taking their points from mapped
+        self.stampPaths(parent, self.formatPaths(mapped))
+
+    def stampPaths(self, parent, path_strings):
+        # same with the path data already formatted
+        self.path_index = 0
+        self.create(parent, self.skeleton, path_strings)
+
+    def create(self, parent, skeleton, path_strings):
+        if not isinstance(skeleton, tuple):
+            parent.append(copy.deepcopy(skeleton))
+            return
+        tag, attrib, text, tail, children = skeleton
+        elem = inkex.etree.SubElement(parent, tag, attrib)
+        elem.text = text
+        elem.tail = tail
+        if tag == inkex.addNS('path','svg'):
+            elem.set('d', path_strings[self.path_index])
+            self.path_index += 1
+        for child in children:
+            self.create(elem, child, path_strings)
+
 class Project(inkex.Effect):
     def __init__(self):
         inkex.Effect.__init__(self)
@@ -30,6 +86,18 @@ class Project(inkex.Effect):
                                      action="store", type="string",
                                      dest="pattern_name", default="default",
                                      help="Pattern name")
+        self.OptionParser.add_option("--query_inkscape",
+                                     action="store", type="inkbool",
+                                     dest="query_inkscape", default=False,
+                                     help="Query the bounding box from a separate Inkscape process")
+        self.OptionParser.add_option("--reuse_geometry",
+                                     action="store", type="inkbool",
+                                     dest="reuse_geometry", default=True,
+                                     help="Parse the source object once instead of copying it for every envelope")
+        self.OptionParser.add_option("--processes",
+                                     action="store", type="int",
+                                     dest="processes", default=0,
+                                     help="Processes mapping the envelopes of large selections, 0 for one per core")
     def effect(self):
         if len(self.options.ids) < 2:
             inkex.errormsg(_("This extension requires two selected paths."))
@@ -48,28 +116,16 @@ class Project(inkex.Effect):
             exit()
 
         if obj.tag == inkex.addNS('path','svg') or obj.tag == inkex.addNS('g','svg'):
-            #query inkscape about the bounding box of obj
-            q = {'x':0,'y':0,'width':0,'height':0}
-            file = self.args[-1]
-            id = self.options.ids[0]
-            for query in q.keys():
-                if bsubprocess:
-                    p = Popen('inkscape --query-%s --query-id=%s "%s"' % (query,id,file), shell=True, stdout=PIPE, stderr=PIPE)
-                    rc = p.wait()
-                    q[query] = scale*float(p.stdout.read())
-                    err = p.stderr.read()
-                else:
-                    f,err = os.popen3('inkscape --query-%s --query-id=%s "%s"' % (query,id,file))[1:]
-                    q[query] = scale*float(f.read())
-                    f.close()
-                    err.close()
-            sp = numpy.array([[q['x'], q['y']+q['height']],[q['x'], q['y']],[q['x']+q['width'], q['y']],[q['x']+q['width'], q['y']+q['height']]])
+            # bounding box of obj, computed from its geometry unless inkscape is asked
+            if self.options.query_inkscape:
+                q = path_bbox.queryBBox(self.args[-1], self.options.ids[0], scale)
+            else:
+                q = path_bbox.getBBox(obj)
 
             self.q = q
-            # map each quad
+            # corners of each quad
+            corners = []
             for envelope in envelopes:
-                obj_copy = copy.deepcopy(obj)
-                self.document.getroot().append(obj_copy)
                 if envelope.tag == inkex.addNS('path','svg'):
                     mat = simpletransform.composeParents(envelope, [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
                     path = cubicsuperpath.parsePath(envelope.get('d'))
@@ -77,102 +133,85 @@ class Project(inkex.Effect):
                         inkex.errormsg(_("This extension requires that the second selected path be four nodes long."))
                         exit()
                     simpletransform.applyTransformToPath(mat, path)
-                    dp = numpy.zeros((4,2))
-                    for i in range(4):
-                        dp[i][0] = path[0][i][1][0]
-                        dp[i][1] = path[0][i][1][1]
-
-                    mat_y = numpy.array([[dp[0][1], dp[1][1]], [dp[3][1], dp[2][1]]])
-                    mat_x = numpy.array([[dp[0][0], dp[1][0]], [dp[3][0], dp[2][0]]])
-                    term1 = 1.0 / ( q['width'] * q['height'])
-
-                    if obj.tag == inkex.addNS("path",'svg'):
-                        self.process_path(obj_copy,mat_x, mat_y, term1)
-                    if obj.tag == inkex.addNS("g",'svg'):
-                        self.process_group(obj_copy,mat_x, mat_y, term1)
+                    corners.append([path[0][i][1] for i in range(4)])
                 else:
                     if envelope.tag == inkex.addNS('g','svg'):
                         inkex.errormsg(_("The second selected object is a group, not a path.\nTry using the procedure Object->Ungroup."))
                     else:
                         inkex.errormsg(_("The second selected object is not a path.\nTry using the procedure Path->Object to Path."))
                     exit()
+
+            # map each quad
+            mats_x, mats_y = core.quadTransforms(corners, orient=False)
+            if self.options.reuse_geometry:
+                template = MotifTemplate(obj)
+                for path_strings in self.map_envelopes(template, q, mats_x, mats_y):
+                    template.stampPaths(self.document.getroot(), path_strings)
+            else:
+                for mat_x, mat_y in zip(mats_x, mats_y):
+                    obj_copy = copy.deepcopy(obj)
+                    self.document.getroot().append(obj_copy)
+                    if obj.tag == inkex.addNS("path",'svg'):
+                        self.process_path(obj_copy,mat_x, mat_y)
+                    if obj.tag == inkex.addNS("g",'svg'):
+                        self.process_group(obj_copy,mat_x, mat_y)
         else:
             inkex.errormsg(_("The first selected object is not a path.\nTry using the procedure Path->Object to Path."))
             exit()
 
-    def process_group(self,group,mat_x, mat_y, term1):
+    def map_envelopes(self, template, q, mats_x, mats_y):
+        # path data of the template for every envelope, in envelope order
+        # batches of envelopes go to a process pool, which holds the template points once per process
+        if len(mats_x) == 0:
+            return []
+        processes = self.options.processes or multiprocessing.cpu_count()
+        if processes == 1 or len(mats_x) == 1 or len(mats_x) * len(template.coords) < min_parallel_points:
+            initMapping(template.commands, template.coords, q)
+            return mapEnvelopes((mats_x, mats_y))
+        batches = [(batch_x, batch_y) for batch_x, batch_y in
+                   zip(numpy.array_split(mats_x, min(len(mats_x), 4*processes)), numpy.array_split(mats_y, min(len(mats_x), 4*processes)))]
+        pool = multiprocessing.Pool(processes, initMapping, (template.commands, template.coords, q))
+        try:
+            results = pool.map(mapEnvelopes, batches)
+        finally:
+            pool.close()
+            pool.join()
+        return [path_strings for batch in results for path_strings in batch]
+
+    def collect_paths(self, group, res):
         for node in group:
             if node.tag == inkex.addNS('path','svg'):
-                self.process_path(node,mat_x, mat_y, term1)
+                res.append(node)
             if node.tag == inkex.addNS('g','svg'):
-                self.process_group(node,mat_x, mat_y, term1)
-
-    def process_path(self,ipath,mat_x, mat_y, term1):
-        mat = simpletransform.composeParents(ipath, [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
-        path_string = ipath.get('d')
-        svg_path = simplepath.parsePath(path_string)
-
-        paths = []
-
-        # for path in svg_path:
-        # inkex.debug("svg_path: " + str(svg_path))
-        for path in svg_path:
-            if path[0] == 'M' or path[0] == 'L':
-                paths.append([path[0], [path[1]]])
-            elif path[0] == 'C' or path[0] == 'Q':
-                pts = []
-                if path[0] == 'C':
-                    num = 3
-                else:
-                    num = 2
-                for i in range(0, num):
-                    pt = [path[1][2*i], path[1][2*i+1]]
-                    pts.append(pt)
-                paths.append([path[0], pts])
-
-            elif path[0] == 'Z':
-                paths.append(['Z', []])
-
-
-        # inkex.debug("paths: " + str(paths) + "\n\n")
-        mat = simpletransform.invertTransform(mat)
-        # simpletransform.applyTransformToPath(mat, p)
-        for path in paths:
-            for pt in path[1]:
-                simpletransform.applyTransformToPoint(mat, pt)
-
-        # do transformation
-        for path in paths:
-            for pt in path[1]:
-                self.project_point(pt,mat_x, mat_y, term1)
+                self.collect_paths(node, res)
+        return res
+
+    def process_group(self,group,mat_x, mat_y):
+        self.process_paths(self.collect_paths(group, []), mat_x, mat_y)
+
+    def process_path(self,ipath,mat_x, mat_y):
+        self.process_paths([ipath], mat_x, mat_y)
+
+    def process_paths(self, ipaths, mat_x, mat_y):
+        # points of all paths go through the bilinear map in one array operation
+        structures = []
+        all_coords = []
+        for ipath in ipaths:
+            mat = simpletransform.composeParents(ipath, [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+            svg_path = simplepath.parsePath(ipath.get('d'))
+            commands, coords = pathToPoints(svg_path)
+            structures.append(commands)
+            all_coords.append(three.Matrix3(mat).inverse().applyToPoints(coords))
+        if len(all_coords) == 0:
+            return
+
+        mapped = bilinearMap(numpy.vstack(all_coords), self.q, mat_x, mat_y)
 
         # back to original form
-        res_paths = []
-        for path in paths:
-            if path[0] == 'C' or path[0] == 'Q':
-                flat_pts = []
-                for pt in path[1]:
-                    flat_pts.append(pt[0])
-                    flat_pts.append(pt[1])
-                res_paths.append([path[0], flat_pts])
-            elif path[0] == 'M' or path[0] == 'L':
-                res_paths.append([path[0], path[1][0]])
-            elif path[0] == 'Z':
-                res_paths.append(path)
-        # inkex.debug("res_paths: " + str(res_paths))
-        res_svg_paths = simplepath.formatPath(res_paths)
-        # inkex.debug("res_svg_paths: " + str(res_svg_paths))
-        ipath.set('d', res_svg_paths)
-
-    def project_point(self,p,mat_x, mat_y, term1):
-        x = p[0]
-        y = p[1]
-        term2 = numpy.array([self.q['x']+self.q['width'] - x, x - self.q['x']])
-        term3 = numpy.array([y - self.q['y'], self.q['y']+self.q['height']-y])
-        x_map = term1 * numpy.matmul(numpy.matmul(term2, mat_x), term3.T)
-        y_map = term1 * numpy.matmul(numpy.matmul(term2, mat_y), term3.T)
-        p[0] = x_map
-        p[1] = y_map
+        start = 0
+        for ipath, commands, coords in zip(ipaths, structures, all_coords):
+            ipath.set('d', pointsToPath(commands, mapped[start:start+len(coords)]))
+            start += len(coords)
 
 if __name__ == '__main__':
     e = Project()
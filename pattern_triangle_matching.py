@@ -3,33 +3,121 @@
 # Written by Clara Kang
 
 import inkex, simplepath, simplestyle, simpletransform
-import three_transform as three
 from lxml import etree
 
-def pathIsTriangle(svg_path):
-    if len(svg_path) == 4 and svg_path[1][0] == 'L' and svg_path[2][0] == 'L' and svg_path[3][0] == 'Z':
-        return True
-    return False
+from affine_map import pathIsTriangle, getTriangleVerts, formMatrix, computePatternTransforms, sharedPatternName
 
 def isPath(node):
     return node.attrib[u'id'].startswith("path")
 
-def getTriangleVerts(svg_path):
-    verts = []
-    for i in range (0, 3):
-        verts.append(svg_path[i][1])
-    return verts
+def findTriangleLayer(document):
+    triangle_layer = document.xpath('//svg:g[@id="triangle_layer"]', namespaces=inkex.NSS)
+    if len(triangle_layer) == 0:
+        return None
+    return triangle_layer[0]
 
-def formMatrix(trngle_verts):
-    matrx = []
-    for i in range (0, 2):
-        row = []
-        for j in range(0, 3):
-            row.append(trngle_verts[j][i])
-        matrx.append(row)
-    matrx.append([1, 1, 1])
-    return matrx
+def getBoundaryAndPattern(document, triangle_layer, pattern_name):
+    # boundary triangle matrix, pattern and defs, with the pattern sized to repeat once in the boundary triangle
+    # returns None after telling the user what is missing
+    # find triangle in the triangle_layer
+    trngl_lyr_children = triangle_layer.getchildren()
+    if not len(trngl_lyr_children) == 1:
+        inkex.debug("more or less than 1 element in Triangle Boundary layer: " + str(len(trngl_lyr_children)))
+        return None
+    bndry_trngle = trngl_lyr_children[0]
+    # seems like a path
+    if not isPath(bndry_trngle):
+        inkex.debug("the shape in triangle boundary layer is not a triangle")
+        return None
+    path_string = bndry_trngle.attrib[u'd']
+    svg_path = simplepath.parsePath(path_string)
 
+    # verified to be triangle
+    if not pathIsTriangle(svg_path):
+        inkex.debug("the shape in triangle boundary layer is not a triangle")
+        return None
+    bndry_trngle_verts = getTriangleVerts(svg_path)
+    bndry_trngle_matrx = formMatrix(bndry_trngle_verts)
+
+    # find pattern
+    defs = document.xpath('//svg:defs', namespaces=inkex.NSS)[0]
+    # get first pattern is default
+    if pattern_name == "default":
+        patterns = defs.xpath('./svg:pattern', namespaces=inkex.NSS)
+    # find pattern with name
+    else:
+        patterns = defs.xpath('./svg:pattern[@id="' + pattern_name + '"]', namespaces=inkex.NSS)
+
+    if len(patterns) == 0:
+        inkex.debug("cannot find pattern")
+        return None
+    pattern = patterns[0]
+    # calculate the size of the pattern so that the pattern repeats exactly once in the bounding triangle
+    # get the union of all paths in pattern and boundary triangle
+    pattern_trngle_union = pattern.xpath('.//svg:path', namespaces=inkex.NSS)
+    pattern_trngle_union.append(bndry_trngle)
+    # get bounding box of the union
+    bb_x_min, bb_x_max, bb_y_min, bb_y_max = simpletransform.computeBBox(pattern_trngle_union)
+    # calculate size of union
+    pattern_width = bb_x_max - bb_x_min
+    pattern_height = bb_y_max - bb_y_min
+    # get scaling factor of pattern
+    pattern_trnsfrm = simpletransform.parseTransform(pattern.attrib[u'patternTransform'])
+    scale_x = pattern_trnsfrm[0][0]
+    scale_y = pattern_trnsfrm[1][1]
+    # set size of pattern
+    pattern.attrib[u'width'] = str(pattern_width / scale_x)
+    pattern.attrib[u'height'] = str(pattern_height / scale_y)
+    return bndry_trngle_matrx, pattern, defs
+
+def fillTriangles(defs, pattern, bndry_trngle_matrx, nodes, trngles_verts, names, share_patterns=False, precision=4):
+    # fill each triangle node with the pattern mapped onto it, through a pattern named names[i]
+    # or, when sharing, through one pattern per distinct transform
+    # returns the number of patterns used
+    if len(trngles_verts) == 0:
+        return 0
+
+    # apply affine transform, composed with initial transform of pattern
+    initial_trnsform = simpletransform.parseTransform(pattern.attrib[u'patternTransform'])
+    final_trnsforms = computePatternTransforms(trngles_verts, bndry_trngle_matrx, initial_trnsform).tolist()
+
+    # index existing patterns by id once, instead of an xpath query over defs per triangle
+    pattern_tag = inkex.addNS('pattern', 'svg')
+    patterns_by_id = {}
+    for child in defs:
+        if child.tag == pattern_tag and child.get(u'id') is not None:
+            patterns_by_id.setdefault(child.get(u'id'), child)
+
+    patterns_used = {} # patterns filled in during this run
+    for node, name, final_trnsform in zip(nodes, names, final_trnsforms):
+        if share_patterns:
+            pattern_name = sharedPatternName(pattern.attrib[u'id'], final_trnsform, precision)
+        else:
+            pattern_name = name
+
+        if pattern_name in patterns_used:
+            pattern_transformed = patterns_used[pattern_name]
+        else:
+            # if pattern for triangle exists, use it
+            if pattern_name in patterns_by_id:
+                pattern_transformed = patterns_by_id[pattern_name]
+            else:
+                # create transformed pattern
+                pattern_transformed = etree.Element("{%s}pattern" % inkex.NSS[u'svg'])
+                patterns_by_id[pattern_name] = pattern_transformed
+            # fill in the attributes for pattern
+            pattern_transformed.attrib[u'id'] = pattern_name
+            pattern_transformed.attrib["{%s}collect"  % inkex.NSS[u'inkscape']] = "always"
+            pattern_transformed.attrib["{%s}href"  % inkex.NSS[u'xlink']] = '#' + pattern.attrib[u'id']
+            pattern_transformed.attrib[u'patternTransform'] = simpletransform.formatTransform(final_trnsform)
+            # append transformed pattern
+            defs.append(pattern_transformed)
+            patterns_used[pattern_name] = pattern_transformed
+        # fill triangle with pattern
+        trngle_styles = simplestyle.parseStyle(node.get(u'style', u''))
+        trngle_styles[u'fill'] = u'url(#' + str(pattern_transformed.attrib[u'id']) + ')'
+        node.attrib[u'style'] = simplestyle.formatStyle(trngle_styles)
+    return len(patterns_used)
 
 class C(inkex.Effect):
     def __init__(self):
@@ -38,6 +126,14 @@ class C(inkex.Effect):
                                      action="store", type="string",
                                      dest="pattern_name", default="default",
                                      help="Pattern name")
+        self.OptionParser.add_option("--share_patterns",
+                                     action="store", type="inkbool",
+                                     dest="share_patterns", default=False,
+                                     help="Use one pattern for all triangles with the same transform")
+        self.OptionParser.add_option("--precision",
+                                     action="store", type="int",
+                                     dest="precision", default=4,
+                                     help="Decimals compared when sharing patterns")
 
     def createLayer(self, id, label):
         layer = etree.Element("{%s}g" % inkex.NSS[u'svg'])
@@ -48,8 +144,8 @@ class C(inkex.Effect):
 
     def effect(self):
         # search for pattern layer
-        triangle_layer = self.document.xpath('//svg:g[@id="triangle_layer"]', namespaces=inkex.NSS)
-        if len(triangle_layer) == 0:
+        triangle_layer = findTriangleLayer(self.document)
+        if triangle_layer is None:
             # append pattern layer
             triangle_layer = self.createLayer("triangle_layer", "Triangle Boundary")
             self.document.getroot().append(triangle_layer)
@@ -58,92 +154,37 @@ class C(inkex.Effect):
                 "3. select triangles that you want to apply pattern to\n"
                 "4. enter pattern id (or default to use first pattern), then apply")
         else:
-            triangle_layer = triangle_layer[0]
-            # find triangle in the triangle_layer
-            trngl_lyr_children = triangle_layer.getchildren()
-            if not len(trngl_lyr_children) == 1:
-                inkex.debug("more or less than 1 element in Triangle Boundary layer: " + str(len(trngl_lyr_children)))
+            boundary_and_pattern = getBoundaryAndPattern(self.document, triangle_layer, self.options.pattern_name)
+            if boundary_and_pattern is None:
                 return
-            else:
-                bndry_trngle = triangle_layer.getchildren()[0]
-                # seems like a path
-                if isPath(bndry_trngle):
-                    path_string = bndry_trngle.attrib[u'd']
-                    svg_path = simplepath.parsePath(path_string)
-
-                    # verified to be triangle
-                    if pathIsTriangle(svg_path):
-                        self.bndry_trngle_verts = getTriangleVerts(svg_path)
-                        self.bndry_trngle_matrx = formMatrix(self.bndry_trngle_verts)
-
-                        # find pattern
-                        self.defs = self.document.xpath('//svg:defs', namespaces=inkex.NSS)[0]
-                        # get first pattern is default
-                        if self.options.pattern_name == "default":
-                            patterns = self.defs.xpath('./svg:pattern', namespaces=inkex.NSS)
-                        # find pattern with name
-                        else:
-                            patterns = self.defs.xpath('./svg:pattern[@id="' + self.options.pattern_name + '"]', namespaces=inkex.NSS)
-
-                        if len(patterns) > 0:
-                            self.pattern = patterns[0]
-                            # calculate the size of the pattern so that the pattern repeats exactly once in the bounding triangle
-                            # get the union of all paths in pattern and boundary triangle
-                            pattern_trngle_union = self.pattern.xpath('.//svg:path', namespaces=inkex.NSS)
-                            pattern_trngle_union.append(bndry_trngle)
-                            # get bounding box of the union
-                            bb_x_min, bb_x_max, bb_y_min, bb_y_max = simpletransform.computeBBox(pattern_trngle_union)
-                            # calculate size of union
-                            pattern_width = bb_x_max - bb_x_min
-                            pattern_height = bb_y_max - bb_y_min
-                            # get scaling factor of pattern
-                            pattern_trnsfrm = simpletransform.parseTransform(self.pattern.attrib[u'patternTransform'])
-                            scale_x = pattern_trnsfrm[0][0]
-                            scale_y = pattern_trnsfrm[1][1]
-                            # set size of pattern
-                            self.pattern.attrib[u'width'] = str(pattern_width / scale_x)
-                            self.pattern.attrib[u'height'] = str(pattern_height / scale_y)
-                        else:
-                            inkex.debug("cannot find pattern")
-                            return
-                else:
-                    inkex.debug("the shape in triangle boundary layer is not a triangle")
-                    return
+            self.bndry_trngle_matrx, self.pattern, self.defs = boundary_and_pattern
 
+        # collect all selected triangles first, so their transforms can be computed in one batch
+        trngle_ids = []
+        trngle_nodes = []
+        trngles_verts = []
         for id,node in self.selected.iteritems():
             if isPath(node):
                 path_string = node.attrib[u'd']
                 svg_path = simplepath.parsePath(path_string)
                 if pathIsTriangle(svg_path):
-                    trngle_verts = getTriangleVerts(svg_path)
-                    trngle_matrx = formMatrix(trngle_verts)
-                    # apply affine transform
-                    pattern_trnsform = three.multiply(trngle_matrx, three.getInverse(self.bndry_trngle_matrx))
-                    # compose with initial transform of pattern
-                    initial_trnsform = simpletransform.parseTransform(self.pattern.attrib[u'patternTransform'])
-                    final_trnsform = simpletransform.composeTransform(pattern_trnsform, initial_trnsform)
-                    # if pattern for triangle exists, use it
-                    pattern_name = "pattern_for_" + str(id)
-                    existing_patterns = self.defs.xpath('./svg:pattern[@id="' + pattern_name + '"]', namespaces=inkex.NSS)
-                    if len(existing_patterns) > 0:
-                        pattern_transformed = existing_patterns[0]
-                    else:
-                        # create transformed pattern
-                        pattern_transformed = etree.Element("{%s}pattern" % inkex.NSS[u'svg'])
-                    # fill in the attributes for pattern
-                    pattern_transformed.attrib[u'id'] = "pattern_for_" + str(id)
-                    pattern_transformed.attrib["{%s}collect"  % inkex.NSS[u'inkscape']] = "always"
-                    pattern_transformed.attrib["{%s}href"  % inkex.NSS[u'xlink']] = '#' + self.pattern.attrib[u'id']
-                    pattern_transformed.attrib[u'patternTransform'] = simpletransform.formatTransform(final_trnsform)
-                    # append transformed pattern
-                    self.defs.append(pattern_transformed)
-                    # fill triangle with pattern
-                    trngle_styles = simplestyle.parseStyle(node.attrib[u'style'])
-                    trngle_styles[u'fill'] = u'url(#' + str(pattern_transformed.attrib[u'id']) + ')'
-                    node.attrib[u'style'] = simplestyle.formatStyle(trngle_styles)
+                    trngle_ids.append(id)
+                    trngle_nodes.append(node)
+                    trngles_verts.append(getTriangleVerts(svg_path))
                 else:
                     inkex.debug("not triangle")
 
+        if len(trngles_verts) == 0:
+            return
+
+        names = ["pattern_for_" + str(id) for id in trngle_ids]
+        patterns_num = fillTriangles(self.defs, self.pattern, self.bndry_trngle_matrx, trngle_nodes, trngles_verts, names,
+            self.options.share_patterns, self.options.precision)
+
+        if self.options.share_patterns:
+            inkex.debug("%d triangles use %d patterns, %d pattern defs saved"
+                % (len(trngle_ids), patterns_num, len(trngle_ids) - patterns_num))
+
 if __name__ == '__main__':
     c = C()
     c.affect()
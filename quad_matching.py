@@ -0,0 +1,103 @@
+import numpy as np
+
+# optional, only needed for the optimal matching
+try:
+    import networkx
+except ImportError:
+    networkx = None
+
+# sweep: longest side matches then nice quads, each first among triangles of the same age, in edge order
+# greedy: best scoring quads first
+# optimal: as many quads as possible, then the best total score
+modes = ['sweep', 'greedy', 'optimal']
+
+def quadCandidates(mesh):
+    # the two triangles on each side shared by two triangles, and the quad they would form,
+    # [edge[0], third vertex of the first, edge[1], third vertex of the second], in the order the sides first appear
+    edge_ids = mesh.edge_order[mesh.edge_triangles[mesh.edge_order, 1] != -1]
+    tringls = mesh.edge_triangles[edge_ids]
+    edges = mesh.edges[edge_ids]
+    third_ids1 = mesh.thirdVerts(tringls[:, 0], edge_ids)
+    third_ids2 = mesh.thirdVerts(tringls[:, 1], edge_ids)
+    return np.stack([edges[:, 0], third_ids1, edges[:, 1], third_ids2], axis=1), tringls
+
+def quadScores(coords, quads):
+    # for Q candidate quads at once: whether the shared side is the longest side of both triangles,
+    # and the sum of relative side length and right angle deviations that createNiceQuads compares to threshold
+    # the sums run in the same order as the scalar code, so the results are identical
+    locs = coords[quads]
+    def getLens(vecs):
+        return np.sqrt(vecs[..., 0] * vecs[..., 0] + vecs[..., 1] * vecs[..., 1])
+    edge_len = getLens(locs[:, 0] - locs[:, 2])
+    # sides edge[0]-third1, edge[1]-third1, edge[0]-third2, edge[1]-third2
+    quad_lens = getLens(locs[:, [0, 2, 0, 2]] - locs[:, [1, 1, 3, 3]])
+    longest = np.all(edge_len[:, np.newaxis] >= quad_lens, axis=1)
+
+    avg_quad_len = (((quad_lens[:, 0] + quad_lens[:, 1]) + quad_lens[:, 2]) + quad_lens[:, 3]) / 4
+    len_diff = np.zeros(len(quads))
+    for k in range(4):
+        len_diff += np.abs(quad_lens[:, k] - avg_quad_len) / avg_quad_len
+
+    # angle at each corner, in the order createNiceQuads visits them
+    angle_diff = np.zeros(len(quads))
+    for k in [1, 2, 3, 0]:
+        vec1 = locs[:, k-1] - locs[:, k]
+        vec2 = locs[:, (k+1)%4] - locs[:, k]
+        cos = (vec1[:, 0] * vec2[:, 0] + vec1[:, 1] * vec2[:, 1]) / (getLens(vec1) * getLens(vec2))
+        angle_diff += np.abs(np.arccos(np.clip(cos, -1.0, 1.0)) - 3.14159/2.0) / (3.14159/2)
+    return longest, len_diff + angle_diff
+
+def takeQuads(cand_ids, tringls, used):
+    # accept candidates in the given order, skipping those with a triangle already taken
+    taken = []
+    tringl_list = tringls.tolist()
+    for cand_id in cand_ids:
+        tringl1, tringl2 = tringl_list[cand_id]
+        if used[tringl1] or used[tringl2]:
+            continue
+        taken.append(cand_id)
+        used[tringl1] = True
+        used[tringl2] = True
+    return taken
+
+def matchSweeps(longest, scores, same_timestamp, tringls, used, threshold):
+    nice = scores <= threshold
+    taken = []
+    for candidates in [longest & same_timestamp, longest, nice & same_timestamp, nice]:
+        taken.extend(takeQuads(np.nonzero(candidates)[0].tolist(), tringls, used))
+    return taken
+
+def matchGreedy(scores, tringls, used, threshold):
+    # scores do not change as quads are taken, so a stable sort pops candidates in the same order a heap would,
+    # equal scores in edge order
+    cand_ids = np.nonzero(scores <= threshold)[0]
+    order = cand_ids[np.argsort(scores[cand_ids], kind='mergesort')]
+    return takeQuads(order.tolist(), tringls, used)
+
+def matchOptimal(scores, tringls, used, threshold):
+    # maximum cardinality matching of the triangles, a better score weighs more
+    graph = networkx.Graph()
+    for cand_id in np.nonzero(scores <= threshold)[0].tolist():
+        tringl1, tringl2 = tringls[cand_id].tolist()
+        if not used[tringl1] and not used[tringl2]:
+            graph.add_edge(tringl1, tringl2, weight=threshold - float(scores[cand_id]), cand_id=cand_id)
+    matching = networkx.max_weight_matching(graph, maxcardinality=True)
+    taken = sorted(graph[tringl1][tringl2]['cand_id'] for tringl1, tringl2 in matching)
+    return takeQuads(taken, tringls, used)
+
+def matchQuads(mesh, mode='sweep', threshold=2.0):
+    # pair the unused triangles of mesh into quads, marking them used, returns Q x 4 vertex ids
+    cand_quads, cand_tringls = quadCandidates(mesh)
+    longest, scores = quadScores(mesh.coords, cand_quads)
+    if mode == 'sweep':
+        same_timestamp = mesh.triangle_timestamps[cand_tringls[:, 0]] == mesh.triangle_timestamps[cand_tringls[:, 1]]
+        taken = matchSweeps(longest, scores, same_timestamp, cand_tringls, mesh.used, threshold)
+    elif mode == 'greedy':
+        taken = matchGreedy(scores, cand_tringls, mesh.used, threshold)
+    elif mode == 'optimal':
+        if networkx is None:
+            raise ImportError("the optimal quad matching requires networkx")
+        taken = matchOptimal(scores, cand_tringls, mesh.used, threshold)
+    else:
+        raise ValueError("unknown quad matching mode: " + str(mode))
+    return cand_quads[taken].reshape(-1, 4).astype(np.int32)
@@ -0,0 +1,54 @@
+import math
+
+class PointGrid:
+    # uniform grid of square cells, each cell holds the points whose loc falls inside it
+    # points are keyed by identity, so the same objects kept in pm can be added and removed
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.order = {} # point -> insertion number, used to break distance ties like a list scan would
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.order)
+
+    def getCell(self, loc):
+        return (int(math.floor(loc[0] / self.cell_size)), int(math.floor(loc[1] / self.cell_size)))
+
+    def add(self, point):
+        cell = self.getCell(point.loc)
+        if cell in self.cells:
+            self.cells[cell].append(point)
+        else:
+            self.cells[cell] = [point]
+        self.order[point] = self.counter
+        self.counter += 1
+
+    def remove(self, point):
+        cell = self.getCell(point.loc)
+        bucket = self.cells[cell]
+        bucket.remove(point)
+        if len(bucket) == 0:
+            del self.cells[cell]
+        del self.order[point]
+
+    # closest point strictly closer than radius, None if there is none
+    # radius must not be larger than cell_size, only the 3x3 block of cells around loc is searched
+    def closest(self, loc, radius):
+        ci, cj = self.getCell(loc)
+        min_dist = radius
+        closest_pt = None
+        for i in range(ci - 1, ci + 2):
+            for j in range(cj - 1, cj + 2):
+                bucket = self.cells.get((i, j))
+                if bucket is None:
+                    continue
+                for pt in bucket:
+                    dx = pt.loc[0] - loc[0]
+                    dy = pt.loc[1] - loc[1]
+                    dist = math.sqrt(dx * dx + dy * dy)
+                    if dist < min_dist or (dist == min_dist and closest_pt is not None and self.order[pt] < self.order[closest_pt]):
+                        min_dist = dist
+                        closest_pt = pt
+        return closest_pt
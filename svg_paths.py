@@ -0,0 +1,150 @@
+# svg path data and transforms without inkscape's simplepath and simpletransform, for the batch driver
+# paths come out in the form of simplepath.parsePath, absolute and reduced to M, L, C and Z:
+# [['M', [x, y]], ['L', [x, y]], ['C', [x1, y1, x2, y2, x, y]], ['Z', []]]
+
+import math
+import re
+
+token_re = re.compile(r'([MmLlHhVvCcSsQqTtAaZz])|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+params_num = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7, 'Z': 0}
+
+def parsePath(d):
+    tokens = token_re.findall(d)
+    res = []
+    x = y = 0.0
+    start_x = start_y = 0.0
+    last_cubic = None # second control point of the previous C or S
+    last_quad = None # control point of the previous Q or T
+    cmd = None
+    i = 0
+    while i < len(tokens):
+        if tokens[i][0]:
+            cmd = tokens[i][0]
+            i += 1
+            if cmd in 'Zz':
+                res.append(['Z', []])
+                x, y = start_x, start_y
+                last_cubic = last_quad = None
+                continue
+        elif cmd is None:
+            raise ValueError("path data does not start with a command: " + d[:20])
+        num = params_num[cmd.upper()]
+        if i + num > len(tokens) or any(tokens[i+k][0] for k in range(num)):
+            raise ValueError("missing numbers after the command " + cmd)
+        params = [float(tokens[i+k][1]) for k in range(num)]
+        i += num
+
+        upper = cmd.upper()
+        relative = cmd != upper
+        # coordinates of the parameters made absolute
+        if relative and upper in 'MLCSQT':
+            params = [p + (x if k % 2 == 0 else y) for k, p in enumerate(params)]
+        elif relative and upper == 'H':
+            params = [params[0] + x]
+        elif relative and upper == 'V':
+            params = [params[0] + y]
+
+        cubic = None
+        quad = None
+        if upper == 'M':
+            res.append(['M', params])
+            start_x, start_y = params
+            # pairs following a moveto are linetos
+            cmd = 'l' if relative else 'L'
+        elif upper == 'L':
+            res.append(['L', params])
+        elif upper == 'H':
+            res.append(['L', [params[0], y]])
+            params = [params[0], y]
+        elif upper == 'V':
+            res.append(['L', [x, params[0]]])
+            params = [x, params[0]]
+        elif upper == 'C':
+            res.append(['C', params])
+            cubic = params[2:4]
+        elif upper == 'S':
+            c1 = [2*x - last_cubic[0], 2*y - last_cubic[1]] if last_cubic else [x, y]
+            res.append(['C', c1 + params])
+            cubic = params[0:2]
+        elif upper in 'QT':
+            if upper == 'Q':
+                q = params[0:2]
+            else:
+                q = [2*x - last_quad[0], 2*y - last_quad[1]] if last_quad else [x, y]
+                params = q + params
+            # degree elevation to a cubic
+            ex, ey = params[2], params[3]
+            res.append(['C', [x + 2.0/3*(q[0] - x), y + 2.0/3*(q[1] - y),
+                              ex + 2.0/3*(q[0] - ex), ey + 2.0/3*(q[1] - ey), ex, ey]])
+            quad = q
+        else:
+            raise ValueError("arcs are not supported, convert them with Path->Object to Path")
+        x, y = params[-2], params[-1]
+        last_cubic = cubic
+        last_quad = quad
+    return res
+
+def formatPath(svg_path):
+    # same output as simplepath.formatPath
+    return "".join([cmd + " ".join([str(p) for p in params]) for cmd, params in svg_path])
+
+def composeTransform(mat1, mat2):
+    # 2x3 matrices, mat1 applied after mat2
+    return [[mat1[0][0]*mat2[0][0] + mat1[0][1]*mat2[1][0],
+             mat1[0][0]*mat2[0][1] + mat1[0][1]*mat2[1][1],
+             mat1[0][0]*mat2[0][2] + mat1[0][1]*mat2[1][2] + mat1[0][2]],
+            [mat1[1][0]*mat2[0][0] + mat1[1][1]*mat2[1][0],
+             mat1[1][0]*mat2[0][1] + mat1[1][1]*mat2[1][1],
+             mat1[1][0]*mat2[0][2] + mat1[1][1]*mat2[1][2] + mat1[1][2]]]
+
+def parseTransform(transform):
+    # svg transform attribute -> 2x3 matrix
+    mat = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]
+    if not transform:
+        return mat
+    for name, args in re.findall(r'(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)', transform):
+        args = [float(arg) for arg in re.findall(token_re.pattern.split('|', 1)[1][1:-1], args)]
+        if name == 'matrix':
+            step = [[args[0], args[2], args[4]], [args[1], args[3], args[5]]]
+        elif name == 'translate':
+            step = [[1.0, 0.0, args[0]], [0.0, 1.0, args[1] if len(args) > 1 else 0.0]]
+        elif name == 'scale':
+            sy = args[1] if len(args) > 1 else args[0]
+            step = [[args[0], 0.0, 0.0], [0.0, sy, 0.0]]
+        elif name == 'rotate':
+            a = math.radians(args[0])
+            cx, cy = (args[1], args[2]) if len(args) > 2 else (0.0, 0.0)
+            step = [[math.cos(a), -math.sin(a), cx - cx*math.cos(a) + cy*math.sin(a)],
+                    [math.sin(a), math.cos(a), cy - cx*math.sin(a) - cy*math.cos(a)]]
+        elif name == 'skewX':
+            step = [[1.0, math.tan(math.radians(args[0])), 0.0], [0.0, 1.0, 0.0]]
+        else:
+            step = [[1.0, 0.0, 0.0], [math.tan(math.radians(args[0])), 1.0, 0.0]]
+        mat = composeTransform(mat, step)
+    return mat
+
+def applyTransformToPath(mat, svg_path):
+    # transform the points of a path parsed by parsePath in place
+    for cmd, params in svg_path:
+        for k in range(0, len(params), 2):
+            x, y = params[k], params[k+1]
+            params[k] = mat[0][0]*x + mat[0][1]*y + mat[0][2]
+            params[k+1] = mat[1][0]*x + mat[1][1]*y + mat[1][2]
+
+def pathCurves(svg_path):
+    # every segment of a path parsed by parsePath as the 4 control points of a cubic, lines included
+    curves = []
+    cur = start = None
+    for cmd, params in svg_path:
+        if cmd == 'M':
+            cur = start = params[0:2]
+            curves.append([cur, cur, cur, cur])
+        elif cmd == 'L':
+            curves.append([cur, cur, params, params])
+            cur = params
+        elif cmd == 'C':
+            curves.append([cur, params[0:2], params[2:4], params[4:6]])
+            cur = params[4:6]
+        elif cmd == 'Z':
+            cur = start
+    return curves
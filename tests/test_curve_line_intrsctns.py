@@ -0,0 +1,89 @@
+# roots of the cubic solvers against np.roots, and the intersections built on them
+# usage: python -m pytest tests
+
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import curve_line_intrsctns as curve_utils
+
+def realRoots(coeffs, lo=-0.5, hi=1.5):
+    # real roots of np.roots in [lo, hi], sorted
+    return sorted(r.real for r in np.roots(coeffs) if abs(r.imag) <= 1e-9 * max(1.0, abs(r)) and lo <= r.real <= hi)
+
+def inRange(roots, lo=-0.5, hi=1.5):
+    roots = np.asarray(roots, dtype=float)
+    return sorted(roots[(roots >= lo) & (roots <= hi)].tolist())
+
+def randomCubics(num, seed=0):
+    # normal coefficients, every other cubic with a leading term from 1e-3 down to 1e-12 of the others
+    rs = np.random.RandomState(seed)
+    coeffs = rs.randn(num, 4)
+    coeffs[1::2, 0] *= 10.0 ** rs.uniform(-12, -3, len(coeffs[1::2]))
+    return coeffs
+
+class SolveCubicTest(unittest.TestCase):
+
+    def assertSameRoots(self, expected, roots):
+        self.assertEqual(len(expected), len(roots))
+        np.testing.assert_allclose(roots, expected, atol=1e-7)
+
+    def testNearQuadratic(self):
+        coeffs = [-1.965e-06, 222.1, -301.4, 97.58]
+        self.assertSameRoots(realRoots(coeffs), inRange(curve_utils.solve_cubic(*coeffs)))
+        roots = curve_utils.solve_cubic_many(*coeffs)
+        self.assertSameRoots(realRoots(coeffs), inRange(roots[~np.isnan(roots)]))
+
+    def testRandom(self):
+        for coeffs in randomCubics(2000):
+            self.assertSameRoots(realRoots(coeffs), inRange(curve_utils.solve_cubic(*coeffs)))
+
+    def testRandomMany(self):
+        coeffs = randomCubics(2000, 1)
+        roots = curve_utils.solve_cubic_many(*coeffs.T)
+        for row, row_roots in zip(coeffs, roots):
+            self.assertSameRoots(realRoots(row), inRange(row_roots[~np.isnan(row_roots)]))
+
+    def testResiduals(self):
+        coeffs = randomCubics(2000, 2)
+        roots = curve_utils.solve_cubic_many(*coeffs.T)
+        a, b, c, d = [x[:, np.newaxis] for x in coeffs.T]
+        residual = np.abs(((a*roots + b)*roots + c)*roots + d)
+        # against the size of the terms summed at each root
+        size = np.abs(a*roots**3) + np.abs(b*roots**2) + np.abs(c*roots) + np.abs(d)
+        found = ~np.isnan(roots)
+        self.assertTrue(np.all(residual[found] <= 1e-12 * size[found]))
+
+    def testDegenerate(self):
+        self.assertEqual(curve_utils.solve_cubic(0.0, 0.0, 0.0, 0.0), [])
+        self.assertEqual(curve_utils.solve_cubic(0.0, 0.0, 2.0, -1.0), [0.5])
+        self.assertSameRoots([1.0, 2.0], sorted(curve_utils.solve_cubic(0.0, 1.0, -3.0, 2.0)))
+        self.assertSameRoots([-1.0, 0.0, 1.0], sorted(curve_utils.solve_cubic(1.0, 0.0, -1.0, 0.0)))
+
+class IntersectTest(unittest.TestCase):
+
+    def testBezierRay(self):
+        # a ray through the middle of an arch crosses it twice
+        ctrl_pts = np.array([[0.0, 0.0], [0.0, 10.0], [10.0, 10.0], [10.0, 0.0]])
+        hits = curve_utils.intersect_bezier_line(ctrl_pts, np.array([[-5.0, 5.0], [0.0, 5.0]]), True)
+        self.assertEqual(len(hits), 2)
+        for hit in hits:
+            self.assertAlmostEqual(hit[1], 5.0)
+
+    def testManyMatchesScalar(self):
+        rs = np.random.RandomState(3)
+        curves = rs.rand(500, 4, 2) * 100
+        rays = rs.rand(500, 2, 2) * 100
+        ts, ss = curve_utils.intersect_beziers_lines(curves, rays, True)
+        for ctrl_pts, ray, t in zip(curves, rays, ts):
+            hits = curve_utils.intersect_bezier_line(ctrl_pts, ray, True)
+            t = t[~np.isnan(t)]
+            self.assertEqual(len(hits), len(t))
+            if len(t) > 0:
+                locs = curve_utils.bezier_eval(ctrl_pts, t[:, np.newaxis])
+                np.testing.assert_allclose(sorted(map(tuple, locs)), sorted(map(tuple, hits)), atol=1e-6)
+
+if __name__ == '__main__':
+    unittest.main()
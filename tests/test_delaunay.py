@@ -0,0 +1,138 @@
+# the bowyer-watson fallback against qhull, the adjacency both hand out, and the constrained triangulation
+# usage: python -m pytest tests
+
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import delaunay
+from path_containment import PathIndex
+
+def triangleSet(triangles):
+    return set(tuple(sorted(row)) for row in np.asarray(triangles).tolist())
+
+def flatArc(rs):
+    # points on a very flat arc with points just inside it, where a super triangle hides hull triangles
+    angles = np.linspace(-0.02, 0.02, 300)
+    arc = np.stack([1e5*np.sin(angles), 1e5*(np.cos(angles) - 1)], axis=1)
+    inner = np.stack([rs.uniform(-1900, 1900, 500), rs.uniform(-15, -5, 500)], axis=1)
+    return np.vstack([arc, inner])
+
+def starLoop(rs, spikes=9, inner_num=300):
+    # star polygon with few points on its sides, so plain delaunay edges cut across its reflex corners,
+    # followed by random points inside it; returns the points and the loop of the polygon
+    angles = np.linspace(0, 2*np.pi, 2*spikes, endpoint=False)
+    radii = np.where(np.arange(2*spikes) % 2 == 0, 50.0, 12.0)
+    corners = np.stack([radii * np.cos(angles), radii * np.sin(angles)], axis=1)
+    paths = [np.array([corners[i], corners[(i+1) % len(corners)]]) for i in range(len(corners))]
+    inner = rs.uniform(-50, 50, (4*inner_num, 2))
+    inner = inner[PathIndex(paths, 0.1).containsMany(inner)][:inner_num]
+    return np.vstack([corners, inner]), list(range(len(corners)))
+
+def polygonArea(pts):
+    return 0.5 * abs(np.sum(pts[:, 0] * np.roll(pts[:, 1], -1) - np.roll(pts[:, 0], -1) * pts[:, 1]))
+
+class MeshTestCase(unittest.TestCase):
+
+    def checkMesh(self, points, triangles, neighbors):
+        # ccw triangles, and neighbors[t][j] across edge j pointing back at t across the reversed edge
+        p = points[triangles]
+        area = (p[:, 1, 0] - p[:, 0, 0]) * (p[:, 2, 1] - p[:, 0, 1]) - (p[:, 1, 1] - p[:, 0, 1]) * (p[:, 2, 0] - p[:, 0, 0])
+        self.assertTrue((area > 0).all())
+        tri = triangles.tolist()
+        for t in range(len(tri)):
+            for j in range(3):
+                u = neighbors[t][j]
+                if u == -1:
+                    continue
+                a, b = tri[t][j], tri[t][(j+1)%3]
+                k = tri[u].index(b)
+                self.assertEqual(tri[u][(k+1)%3], a)
+                self.assertEqual(neighbors[u][k], t)
+
+    def checkDelaunay(self, points, triangles):
+        # no point strictly inside the circumcircle of a triangle
+        p = points[triangles]
+        ax, ay = p[:, 0, 0], p[:, 0, 1]
+        bx, by = p[:, 1, 0], p[:, 1, 1]
+        cx, cy = p[:, 2, 0], p[:, 2, 1]
+        d = 2.0 * (ax*(by - cy) + bx*(cy - ay) + cx*(ay - by))
+        ux = ((ax*ax + ay*ay)*(by - cy) + (bx*bx + by*by)*(cy - ay) + (cx*cx + cy*cy)*(ay - by)) / d
+        uy = ((ax*ax + ay*ay)*(cx - bx) + (bx*bx + by*by)*(ax - cx) + (cx*cx + cy*cy)*(bx - ax)) / d
+        r2 = (ax - ux)**2 + (ay - uy)**2
+        for x, y, rr, row in zip(ux, uy, r2, triangles.tolist()):
+            dist2 = (points[:, 0] - x)**2 + (points[:, 1] - y)**2
+            dist2[row] = np.inf
+            self.assertTrue((dist2 >= rr * (1 - 1e-9)).all())
+
+class TriangulationTest(MeshTestCase):
+
+    def testRandom(self):
+        points = np.random.RandomState(0).rand(1000, 2) * 100
+        triangles, neighbors = delaunay.triangulateBowyerWatson(points)
+        self.checkMesh(points, triangles, neighbors)
+        self.checkDelaunay(points, triangles)
+
+    def testHull(self):
+        # every triangle of the convex hull is there, with the flat arc as hull
+        points = flatArc(np.random.RandomState(1))
+        triangles, neighbors = delaunay.triangulateBowyerWatson(points)
+        self.checkMesh(points, triangles, neighbors)
+        p = points[triangles]
+        area = 0.5 * np.abs((p[:, 1, 0] - p[:, 0, 0]) * (p[:, 2, 1] - p[:, 0, 1])
+                            - (p[:, 1, 1] - p[:, 0, 1]) * (p[:, 2, 0] - p[:, 0, 0])).sum()
+        if delaunay.QhullDelaunay is not None:
+            from scipy.spatial import ConvexHull
+            self.assertAlmostEqual(area / ConvexHull(points).volume, 1.0, places=9)
+        # euler: 2n - 2 - h triangles for n points with h of them on the hull
+        hull_edges = np.count_nonzero(neighbors == -1)
+        self.assertEqual(len(triangles), 2*len(points) - 2 - hull_edges)
+
+    @unittest.skipIf(delaunay.QhullDelaunay is None, "scipy not installed")
+    def testSameAsQhull(self):
+        rs = np.random.RandomState(2)
+        for points in [rs.rand(2000, 2) * 100, flatArc(rs)]:
+            triangles, neighbors = delaunay.triangulateBowyerWatson(points)
+            qhull_triangles, qhull_neighbors = delaunay.triangulateQhull(points)
+            self.checkMesh(points, qhull_triangles, qhull_neighbors)
+            self.assertEqual(triangleSet(triangles), triangleSet(qhull_triangles))
+
+class ConstrainedTest(MeshTestCase):
+
+    def checkConstrained(self, use_qhull):
+        rs = np.random.RandomState(3)
+        points, loop = starLoop(rs)
+        triangles, neighbors = delaunay.triangulateConstrained(points, loop, use_qhull)
+        self.checkMesh(points, triangles, neighbors)
+
+        # every edge of the loop is a triangle edge, and the only edges without a neighbor
+        edges = set()
+        hull_edges = set()
+        for row, nbs in zip(triangles.tolist(), neighbors.tolist()):
+            for j in range(3):
+                edge = tuple(sorted((row[j], row[(j+1)%3])))
+                edges.add(edge)
+                if nbs[j] == -1:
+                    hull_edges.add(edge)
+        loop_edges = set(tuple(sorted((loop[i], loop[(i+1) % len(loop)]))) for i in range(len(loop)))
+        self.assertTrue(loop_edges <= edges)
+        self.assertEqual(hull_edges, loop_edges)
+
+        # nothing outside: the triangles cover exactly the polygon
+        p = points[triangles]
+        area = 0.5 * ((p[:, 1, 0] - p[:, 0, 0]) * (p[:, 2, 1] - p[:, 0, 1])
+                      - (p[:, 1, 1] - p[:, 0, 1]) * (p[:, 2, 0] - p[:, 0, 0])).sum()
+        self.assertAlmostEqual(area, polygonArea(points[loop]), places=6)
+        self.assertEqual(len(np.unique(triangles)), len(points))
+
+    def testBowyerWatson(self):
+        self.checkConstrained(False)
+
+    @unittest.skipIf(delaunay.QhullDelaunay is None, "scipy not installed")
+    def testQhull(self):
+        self.checkConstrained(True)
+
+if __name__ == '__main__':
+    unittest.main()
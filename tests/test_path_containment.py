@@ -0,0 +1,86 @@
+# PathIndex against casting each ray at every edge of the boundary
+# usage: python -m pytest tests
+
+import os
+import sys
+import math
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import curve_line_intrsctns as curve_utils
+from path_containment import PathIndex, flattenPaths
+
+kappa = 0.5523 # control point distance of a quarter circle as a cubic
+
+def starPaths(spikes=7):
+    # closed polygon with reflex corners, as lines
+    angles = np.linspace(0, 2*math.pi, 2*spikes, endpoint=False)
+    radii = np.where(np.arange(2*spikes) % 2 == 0, 50.0, 20.0)
+    pts = np.stack([radii * np.cos(angles), radii * np.sin(angles)], axis=1)
+    return [np.array([pts[i], pts[(i+1) % len(pts)]]) for i in range(len(pts))]
+
+def circlePaths(radius=40.0):
+    # four cubics
+    k = kappa * radius
+    corners = [[radius, 0], [0, radius], [-radius, 0], [0, -radius]]
+    handles = [[[radius, k], [k, radius]], [[-k, radius], [-radius, k]],
+               [[-radius, -k], [-k, -radius]], [[k, -radius], [radius, -k]]]
+    return [np.array([corners[i]] + handles[i] + [corners[(i+1) % 4]], dtype=float) for i in range(4)]
+
+def bruteContains(edges, pt):
+    crossings = 0
+    for x0, y0, x1, y1 in edges:
+        if (y0 > pt[1]) != (y1 > pt[1]) and x0 + (pt[1] - y0) * (x1 - x0) / (y1 - y0) > pt[0]:
+            crossings += 1
+    return crossings % 2 == 1
+
+class PathIndexTest(unittest.TestCase):
+
+    def checkBrute(self, paths, pts, tolerance):
+        index = PathIndex(paths, tolerance)
+        edges = flattenPaths(paths, tolerance)
+        expected = [bruteContains(edges, pt) for pt in pts]
+        self.assertEqual(index.containsMany(pts).tolist(), expected)
+        self.assertEqual([index.contains(pt) for pt in pts], expected)
+
+    def testStar(self):
+        rs = np.random.RandomState(0)
+        pts = rs.uniform(-60, 60, (2000, 2))
+        # rays through the corners
+        paths = starPaths()
+        pts[:len(paths)] = [path[0] + [-5.0, 0.0] for path in paths]
+        self.checkBrute(paths, pts, 0.1)
+
+    def testCircle(self):
+        rs = np.random.RandomState(1)
+        self.checkBrute(circlePaths(), rs.uniform(-50, 50, (2000, 2)), 0.01)
+
+    def testExact(self):
+        # against the distance to the center, away from the small error of the cubic circle
+        rs = np.random.RandomState(2)
+        pts = rs.uniform(-50, 50, (5000, 2))
+        dist = np.hypot(pts[:, 0], pts[:, 1])
+        pts = pts[np.abs(dist - 40.0) > 0.02]
+        inside = PathIndex(circlePaths(), 1.0).containsExact(pts)
+        self.assertEqual(inside.tolist(), (np.hypot(pts[:, 0], pts[:, 1]) < 40.0).tolist())
+
+    def testExactNearCurve(self):
+        # just inside the curve, where a coarse flattened copy puts points outside
+        paths = circlePaths()
+        ts = np.linspace(0.05, 0.95, 50)
+        locs = np.vstack([curve_utils.bezier_eval_many(path, ts) for path in paths])
+        pts = locs * (1.0 - 1e-4)
+        self.assertTrue(PathIndex(paths, 1.0).containsExact(pts).all())
+        self.assertFalse(PathIndex(paths, 1.0).containsExact(locs * (1.0 + 1e-4)).any())
+
+    def testExactStar(self):
+        rs = np.random.RandomState(3)
+        paths = starPaths()
+        pts = rs.uniform(-60, 60, (2000, 2))
+        pts[:len(paths)] = [path[0] + [-5.0, 0.0] for path in paths]
+        index = PathIndex(paths, 0.1)
+        self.assertEqual(index.containsExact(pts).tolist(), index.containsMany(pts).tolist())
+
+if __name__ == '__main__':
+    unittest.main()
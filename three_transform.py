@@ -1,40 +1,90 @@
-def multiply(A, B):
-    def getEntry(row, col):
-        res = 0
-        for k in range(0, 3):
-            res += A[row][k] * B[k][col]
-        return res
-    res = [[0,0,0],[0,0,0],[0,0,0]]
-    for i in range(0, 3):
-        for j in range(0, 3):
-            res[i][j] = getEntry(i, j)
-    return res
+import numpy as np
 
-def getDeterminant3(matrx):
+class Matrix3(object):
+    # immutable 3x3 matrix backed by a numpy array, determinant and inverse are computed once and cached
+    # a 2x3 svg transform (as used by simpletransform) is accepted and treated as affine
+    __slots__ = ('m', '_det', '_inverse')
+
+    def __init__(self, matrx):
+        if isinstance(matrx, Matrix3):
+            m = matrx.m
+        else:
+            m = np.array(matrx, dtype=float)
+            if m.shape == (2, 3):
+                m = np.vstack([m, [0.0, 0.0, 1.0]])
+            elif m.shape != (3, 3):
+                raise Exception("matrix not of size 3x3")
+            m.flags.writeable = False
+        self.m = m
+        self._det = None
+        self._inverse = None
+
+    def __mul__(self, other):
+        return self.multiply(other)
+
+    def tolist(self):
+        return self.m.tolist()
+
+    def toTransform(self):
+        # 2x3 svg transform for simpletransform.formatTransform
+        return self.m[0:2].tolist()
+
+    def multiply(self, other):
+        return Matrix3(np.dot(self.m, Matrix3(other).m))
+
+    def compose(self, trnsform):
+        # same as simpletransform.composeTransform(self, trnsform)
+        return self.multiply(trnsform)
+
+    def transpose(self):
+        return Matrix3(self.m.T)
+
+    def getMinor(self, i, j):
+        rows = [row for row in range(0, 3) if row != i]
+        cols = [col for col in range(0, 3) if col != j]
+        m = self.m
+        return m[rows[0], cols[0]] * m[rows[1], cols[1]] - m[rows[0], cols[1]] * m[rows[1], cols[0]]
+
+    def determinant(self):
+        if self._det is None:
+            m = self.m
+            self._det = float(m[0, 0] * self.getMinor(0, 0) - m[0, 1] * self.getMinor(0, 1) + m[0, 2] * self.getMinor(0, 2))
+        return self._det
+
+    def inverse(self):
+        # adjugate over determinant
+        if self._inverse is None:
+            det = self.determinant()
+            if det == 0:
+                raise ZeroDivisionError("matrix is singular")
+            m = self.m
+            cofactors = np.cross(m[[1, 2, 0]], m[[2, 0, 1]])
+            self._inverse = Matrix3(cofactors.T / det)
+            self._inverse._inverse = self
+        return self._inverse
+
+    def applyToPoints(self, pts):
+        # affine part applied to an N x 2 array of points
+        pts = np.asarray(pts, dtype=float)
+        return np.dot(pts, self.m[0:2, 0:2].T) + self.m[0:2, 2]
+
+def checkSize(matrx):
     if len(matrx) != 3 or len(matrx[0]) != 3:
         raise Exception("matrix not of size 3x3")
-    return float(matrx[0][0] * getMinor(matrx, 0, 0) - matrx[0][1] * getMinor(matrx, 0, 1) + matrx[0][2] * getMinor(matrx, 0, 2))
+
+def multiply(A, B):
+    return Matrix3(A).multiply(B).tolist()
+
+def getDeterminant3(matrx):
+    checkSize(matrx)
+    return Matrix3(matrx).determinant()
 
 def getMinor(matrx, i, j):
-    def get2x2det(mat2):
-        return mat2[0][0]*mat2[1][1] - mat2[0][1]*mat2[1][0]
-    if len(matrx) != 3 or len(matrx[0]) != 3:
-        raise Exception("matrix not of size 3x3")
-    mat2 = []
-    for row in range (0, 3):
-        if row == i:
-            continue
-        nums_on_row = []
-        for col in range (0, 3):
-            if col == j:
-                continue
-            nums_on_row.append(matrx[row][col])
-        mat2.append(nums_on_row)
-    return get2x2det(mat2)
+    checkSize(matrx)
+    return Matrix3(matrx).getMinor(i, j)
 
 def transpose(matrx):
-    if len(matrx) != 3 or len(matrx[0]) != 3:
-        raise Exception("matrix not of size 3x3")
+    checkSize(matrx)
     for i in range (0,3):
         for j in range (i, 3):
             tmp = matrx[i][j]
@@ -42,13 +92,4 @@ def transpose(matrx):
             matrx[j][i] = tmp
 
 def getInverse(matrx):
-    det = getDeterminant3(matrx)
-    res = [[0,0,0],[0,0,0],[0,0,0]]
-    for i in range(0, 3):
-        for j in range(0, 3):
-            cofactor = 1
-            if (i+j)%2 != 0:
-                cofactor = -1
-            res[i][j] = cofactor * getMinor(matrx, i, j) / det
-    transpose(res)
-    return res
+    return Matrix3(matrx).inverse().tolist()
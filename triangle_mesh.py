@@ -0,0 +1,394 @@
+# mesh generation of generate_triangles without inkex, also used by the batch driver
+
+# standard library
+import math
+import warnings
+import multiprocessing
+from collections import deque
+import numpy as np
+# local library
+import curve_line_intrsctns as curve_utils
+from spatial_grid import PointGrid
+from path_containment import PathIndex
+
+threshold = 2.0 # default quality threshold of a quad, see quad_matching.quadScores
+flatten_tolerance = 0.01 # max distance between boundary curves and their flattened copy, relative to spacing
+point_colors = {1: "#ff0000", 2: "#0000ff", 3: "#00ff00", 4: "#000000"} # by point type
+point_style = "fill:%s;fill-opacity:1;stroke:none;stroke-width:0.26458332;stroke-opacity:1"
+polygon_style = "fill:%s;stroke:#000000;stroke-width:0.26458332px;stroke-linecap:butt;stroke-linejoin:miter;stroke-opacity:1"
+triangle_color = "#a6e2ff"
+quad_color = "#ffa4a4"
+
+class Point:
+    # 1 for vertex point, 2 for edge point, 3 for internal point
+    timestamp = 0
+
+    def __init__(self, type, loc, normal=np.array([1, 0])):
+        self.type = type
+        self.loc = loc
+        self.normal = normal
+        self.timestamp = Point.timestamp
+        Point.timestamp += 1
+
+    def __str__(self):
+        if self.type == 1:
+            type_str = "v"
+        elif self.type == 2:
+            type_str = "e"
+        else:
+            type_str = "i"
+        return "type: " + type_str + ", loc" + str(self.loc)
+
+
+def getSignedAngle(vec1, vec2):
+    a = np.dot(vec1, vec2) / ( np.linalg.norm(vec1)  * np.linalg.norm(vec2))
+    if a >= 1: # vector parallel, angle is 0
+        return 0
+    angle = math.acos(np.dot(vec1, vec2) / ( np.linalg.norm(vec1)  * np.linalg.norm(vec2)))
+    vec1_3d = np.append(vec1, 0)
+    vec2_3d = np.append(vec2, 0)
+
+    cross_prdct = np.cross(vec1_3d, vec2_3d)
+    if (cross_prdct[2] <= 0):
+        return -angle
+    else:
+        return angle
+
+# return true if ccw, false if cw
+def pathCCW(paths):
+    angle_sum = 0
+    vec1 = paths[-1][1] - paths[-1][0]
+    for path in paths:
+        # bezier curve
+        if (len(path) == 4):
+            for i in range(0, 3):
+                # overlapping points
+                if np.array_equal(path[i+1], path[i]):
+                    continue
+                vec2 = path[i+1] - path[i]
+                angle_sum += getSignedAngle(vec1, vec2)
+                vec1 = vec2
+        else:
+            if np.array_equal(path[1], path[0]):
+                continue
+            vec2 = path[1] - path[0]
+            angle_sum += getSignedAngle(vec1, vec2)
+            vec1 = vec2
+
+    if angle_sum >= 0:
+        return True
+    return False
+
+def getPathLen(path):
+    if len(path) == 2:
+        return np.linalg.norm(path[1] - path[0])
+    else:
+        return curve_utils.bezier_length(path)
+
+def pathEval(path, t):
+    if len(path) == 2:
+        return path[0] + t * (path[1] - path[0])
+    else:
+        return curve_utils.bezier_eval(path, t)
+
+def getArcTable(path, arc_tolerance=0):
+    # t and arc length at sample points along the path, exact for a line
+    # curves are sampled at a fixed rate, or adaptively within arc_tolerance when it is positive
+    if len(path) == 2:
+        return np.array([0.0, 1.0]), np.array([0.0, getPathLen(path)])
+    elif arc_tolerance > 0:
+        arc_table, err = curve_utils.adaptive_arc_length_table(path, arc_tolerance)
+        if err > arc_tolerance: # subdivision stopped at its depth limit
+            warnings.warn("the length of a curve is only known within %g, above the tolerance %g" % (err, arc_tolerance))
+        return arc_table
+    else:
+        return curve_utils.arc_length_table(path)
+
+def getTsAtLens(path, arc_table, lengths, arc_tolerance=0):
+    if len(path) == 4 and arc_tolerance > 0: # adaptive table holds exact lengths, refine t on the curve
+        return curve_utils.t_at_lengths(arc_table, lengths, path)
+    else:
+        return curve_utils.t_at_lengths(arc_table, lengths)
+
+def getNormalAtT(path, t, ccw):
+    if len(path) == 2:
+        return curve_utils.line_normal(path, ccw)
+    else:
+        return curve_utils.bezier_normal(path, t, ccw)
+
+def formatCoords(locs):
+    # N x 2 points -> N pairs of coordinate strings
+    return [('%.3f' % x, '%.3f' % y) for x, y in np.asarray(locs, dtype=float).reshape(-1, 2).tolist()]
+
+def formatCircles(locs, radius):
+    # N x 2 centers -> N closed path strings, each a circle drawn as two arcs
+    fmt = 'M %.3f,%.3f a ' + ('%.3f,%.3f 0 1,0 ' % (radius, radius)) + '%.3f,0 a ' \
+        + ('%.3f,%.3f 0 1,0 ' % (radius, radius)) + '%.3f,0 z'
+    return [fmt % (x - radius, y, 2*radius, -2*radius) for x, y in np.asarray(locs, dtype=float).reshape(-1, 2).tolist()]
+
+def formatPolygons(locs):
+    # P x K x 2 corners -> P closed path strings, each made by one % format over all its coordinates
+    locs = np.asarray(locs, dtype=float)
+    if len(locs) == 0:
+        return []
+    fmt = 'M' + ' %.3f,%.3f' * locs.shape[1] + ' z'
+    return [fmt % tuple(row) for row in locs.reshape(len(locs), -1).tolist()]
+
+def orientQuads(corners):
+    # Q x 4 x 2 quad corners, reversed where needed so every quad winds like the corners of a bilinear envelope
+    x = corners[:, :, 0]
+    y = corners[:, :, 1]
+    area = np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1)
+    corners = corners.copy()
+    corners[area < 0] = corners[area < 0][:, ::-1]
+    return corners
+
+def mergePoints(point1, point2, remove): # point1 not yet added to the points
+    # Pm merge rule for a new point1 and an existing point2 within Pm of it,
+    # returns the point taking the place of point1 or None, remove takes point2 out of the points
+    def takeAvg(pt1, pt2):
+        return Point(3, 0.5*(pt1.loc + pt2.loc))
+
+    if point1.type == 3:
+        if point2.type != 3:
+            return None
+        else:
+            avgPoint = takeAvg(point1, point2)
+            remove(point2)
+            return avgPoint
+    else:
+        remove(point2)
+        return point1
+
+def mergeNearby(point, closest_pt, getClosestPt, remove):
+    merged_pt = mergePoints(point, closest_pt, remove)
+    while closest_pt != None and merged_pt != None: # keep merging until no point nearby or point get eaten
+        closest_pt = getClosestPt(merged_pt.loc)
+        if closest_pt != None:
+            merged_pt = mergePoints(point, closest_pt, remove)
+    return merged_pt
+
+def generateInternalPoints(paths, pts, spacing, path_index=None, rect=None):
+    # the front starts from the edge points, new points are only placed inside rect if given
+    Pm = spacing / math.sqrt(2) # min dist between any two points
+    if path_index is None:
+        path_index = PathIndex(paths, spacing * flatten_tolerance)
+
+    pw = deque() # existing points
+    pm = [] # to process later
+    pm_index = {} # point -> its index in pm
+    alive = [] # by index in pm, False once a point is merged away, pw skips such points
+    grid = PointGrid(Pm) # spatial index over the live points of pm, kept in sync with it
+
+    def genFront(point):
+        pt_loc = point.loc + spacing * point.normal
+        return Point(3, pt_loc, point.normal)
+
+    def genLeft(point):
+        left_dir = curve_utils.rotate90ccw(point.normal)
+        pt_loc = point.loc + spacing * left_dir
+        return Point(3, pt_loc, left_dir)
+
+    def genRight(point):
+        right_dir = curve_utils.rotate90cw(point.normal)
+        pt_loc = point.loc + spacing * right_dir
+        return Point(3, pt_loc, right_dir)
+
+    def inRect(pt_loc):
+        return rect is None or (rect[0] <= pt_loc[0] <= rect[2] and rect[1] <= pt_loc[1] <= rect[3])
+
+    def getClosestPt(point_loc):
+        return grid.closest(point_loc, Pm)
+
+    def addToPm(point):
+        pm_index[point] = len(pm)
+        pm.append(point)
+        alive.append(True)
+        grid.add(point)
+
+    def delFromPmPw(point):
+        index = pm_index[point]
+        if alive[index]:
+            alive[index] = False
+            grid.remove(point)
+
+    for point in pts:
+        if point.type == 2:
+            pw.append(point)
+        addToPm(point)
+
+    while len(pw) > 0:
+        pt = pw.popleft()
+        if not alive[pm_index[pt]]:
+            continue
+        pt_nbs = [genFront(pt), genLeft(pt), genRight(pt)]
+        for pt_nb in pt_nbs:
+            if inRect(pt_nb.loc) and path_index.contains(pt_nb.loc):
+                closest_pt = getClosestPt(pt_nb.loc)
+                if closest_pt == None: # point survives
+                    addToPm(pt_nb)
+                    pw.append(pt_nb)
+                else:
+                    merged_pt = mergeNearby(pt_nb, closest_pt, getClosestPt, delFromPmPw)
+                    if merged_pt != None:
+                        addToPm(merged_pt)
+    return [point for point, is_alive in zip(pm, alive) if is_alive]
+
+def generateTile(task):
+    # run the front in one tile, returns the new internal points in the order they were kept
+    # and their ages, when they were made counted from the start of the tile's front
+    coords, normals, types, spacing, path_index, rect = task
+    pts = [Point(type, np.array(loc), np.array(normal)) for loc, normal, type in zip(coords, normals, types)]
+    start = Point.timestamp
+    pm = generateInternalPoints(None, pts, spacing, path_index, rect)
+    locs = np.array([point.loc for point in pm[len(pts):]], dtype=float).reshape(-1, 2)
+    return locs, np.array([point.timestamp - start for point in pm[len(pts):]], dtype=np.int64)
+
+def mergeSeams(pts, tiles_pts, seams, axis, Pm):
+    # tiles only see their own points, so points within Pm of a seam are merged again in tile order
+    # with the same rule as the front, points further away cannot be closer than Pm to another tile's points
+    grid = PointGrid(Pm)
+    res = list(pts)
+    for point in pts:
+        grid.add(point)
+    seams = np.array(seams, dtype=float)
+    band = []
+    for tile_pts in tiles_pts:
+        coord = np.array([point.loc[axis] for point in tile_pts], dtype=float).reshape(-1, 1)
+        near = (np.abs(coord - seams) <= Pm).any(axis=1).tolist()
+        for point, is_near in zip(tile_pts, near):
+            if is_near:
+                band.append(point)
+            else:
+                res.append(point)
+                grid.add(point)
+
+    removed = set()
+    def remove(point):
+        removed.add(point)
+        grid.remove(point)
+
+    def getClosestPt(point_loc):
+        return grid.closest(point_loc, Pm)
+
+    for point in band:
+        closest_pt = getClosestPt(point.loc)
+        if closest_pt == None:
+            merged_pt = point
+        else:
+            merged_pt = mergeNearby(point, closest_pt, getClosestPt, remove)
+        if merged_pt != None:
+            if merged_pt is not point: # the average takes the place of the band point, and its age
+                merged_pt.timestamp = point.timestamp
+            res.append(merged_pt)
+            grid.add(merged_pt)
+    return [point for point in res if point not in removed]
+
+def generateInternalPointsTiled(paths, pts, spacing, path_index, tiles, processes=None):
+    # the outline is cut into tiles, strips across its longer side, and the front runs in each tile in a process pool
+    # every strip reaches the outline at both ends, so each front starts from the edge points in and near its tile
+    Pm = spacing / math.sqrt(2)
+    if path_index is None:
+        path_index = PathIndex(paths, spacing * flatten_tolerance)
+    locs = np.array([point.loc for point in pts], dtype=float)
+    lo = locs.min(axis=0) - spacing
+    hi = locs.max(axis=0) + spacing
+    axis = int(np.argmax(hi - lo))
+    seams = np.linspace(lo[axis], hi[axis], tiles + 1).tolist()
+
+    tasks = []
+    for i in range(tiles):
+        rect = [lo[0], lo[1], hi[0], hi[1]]
+        rect[axis], rect[axis + 2] = seams[i], seams[i+1]
+        # edge points just outside the tile also grow into it
+        near = (locs[:, axis] >= seams[i] - spacing) & (locs[:, axis] <= seams[i+1] + spacing)
+        tile_pts = [point for point, is_near in zip(pts, near.tolist()) if is_near]
+        tasks.append(([point.loc.tolist() for point in tile_pts], [np.asarray(point.normal).tolist() for point in tile_pts],
+                      [point.type for point in tile_pts], spacing, path_index, tuple(rect)))
+
+    base = Point.timestamp # taken before the tiles run, they make points in this process when processes is 1
+    if processes == 1:
+        results = [generateTile(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(generateTile, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    # timestamps by the age of a point in its tile's front, as the fronts grow at the same pace the points a single
+    # front would make at the same time get close timestamps; interleaved by tile, so they stay distinct
+    tiles_pts = []
+    for i, (tile_locs, tile_ages) in enumerate(results):
+        tile_pts = [Point(3, loc) for loc in tile_locs]
+        for point, age in zip(tile_pts, tile_ages.tolist()):
+            point.timestamp = base + age * tiles + i
+        tiles_pts.append(tile_pts)
+    max_age = max([int(ages.max()) for locs, ages in results if len(ages) > 0] + [0])
+    Point.timestamp = max(Point.timestamp, base + (max_age + 1) * tiles)
+    return mergeSeams(pts, tiles_pts, seams[1:-1], axis, Pm)
+
+def outlinePaths(svg_path):
+    # lines and bezier curves of a parsed outline, as arrays of 2 or 4 points
+    sx, sy = svg_path[0][1][0], svg_path[0][1][1]
+    paths = []
+
+    for path in svg_path:
+        # bezier curve
+        if path[0] == 'C':
+            px = [sx] + [path[1][i] for i in range(0, 5, 2)]
+            py = [sy] + [path[1][i] for i in range(1, 6, 2)]
+            paths.append(np.array([np.array(pt) for pt in zip(px, py)]))
+
+            sx, sy = px[-1], py[-1]
+            # curve_len = curve_utils.bezier_length(paths[-1])
+
+        elif path[0] == 'L':
+            ex, ey = path[1][0], path[1][1]
+            paths.append(np.array([np.array([sx, sy]), np.array([ex, ey])]))
+            sx, sy = ex, ey
+        elif path[0] == 'Z' and (not np.isclose(paths[-1][-1], paths[0][0]).all()): # does not end at start, add segment connecting them
+            paths.append(np.array([np.array([sx, sy]), np.array([svg_path[0][1][0], svg_path[0][1][1]])]))
+    return paths
+
+def outlinePoints(paths, spacing, arc_tolerance=0):
+    # vertex points and evenly spaced edge points along the outline, in order
+    # find orientation of paths
+    ccw = pathCCW(paths)
+
+    points = []
+    for path in paths:
+        v_pt = Point(1, path[0]) # vertex points
+        points.append(v_pt)
+
+        arc_table = getArcTable(path, arc_tolerance)
+        path_len = arc_table[1][-1]
+        segs_num = math.floor(path_len/spacing)
+
+        if segs_num == 0:
+            continue
+
+        # place all edge points of the path in one lookup
+        adj_spacing = path_len / segs_num
+        ts = getTsAtLens(path, arc_table, adj_spacing * np.arange(1, int(segs_num)), arc_tolerance)
+        e_pt_locs = pathEval(path, ts[:, np.newaxis])
+        for t, e_pt_loc in zip(ts, e_pt_locs):
+            e_pt_norm = getNormalAtT(path, t, ccw)
+            e_pt = Point(2, e_pt_loc, e_pt_norm) # edge points
+            points.append(e_pt)
+    return points
+
+def outsideTriangles(coords, types, triangles, path_index):
+    # T bool, True for the triangles outside the outline, only those with all vertices on the outline can be
+    # classify the midpoints of all boundary triangles in one call, against the curves as they can be close to them
+    outside = np.zeros(len(triangles), dtype=bool)
+    if len(triangles) == 0:
+        return outside
+    bndry_trngls = np.nonzero((types[triangles] != 3).all(axis=1))[0]
+    if len(bndry_trngls) == 0:
+        return outside
+    midpts = coords[triangles[bndry_trngls]].mean(axis=1)
+    inside = path_index.containsExact(midpts)
+    outside[bndry_trngls[~inside]] = True
+    return outside